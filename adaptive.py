@@ -0,0 +1,139 @@
+"""An adaptive study that picks the next batch of runs from the results so far."""
+
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+from pandas import DataFrame
+
+from combinations import ARGUMENT_NAMES, CombinationSpace
+from sampling import sample
+from surrogate import Surrogate
+
+
+CRITERIA = ['Expected improvement', 'Uncertainty']
+
+_erf = np.vectorize(math.erf)
+
+
+def expected_improvement(mean: np.ndarray, std: np.ndarray, best: float) -> np.ndarray:
+    """Get the expected improvement over the lowest EUI so far."""
+    std = np.maximum(std, 1e-12)
+    z = (best - mean) / std
+    cdf = 0.5 * (1 + _erf(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return (best - mean) * cdf + std * pdf
+
+
+class AdaptiveStudy:
+    """A study that is submitted in batches until a run budget or convergence.
+
+    The first batch is a Latin hypercube sample of the space. Every next batch is the
+    combinations with the highest score on a surrogate fitted to all the results so
+    far.
+
+    Args:
+        space: The space of design combinations.
+        batch_size: Number of runs in each batch.
+        budget: Maximum number of runs of the study.
+        criterion: One of the CRITERIA to score the combinations.
+        tolerance: The study is converged when the best expected improvement is less
+            than this fraction of the spread of the EUI so far.
+        min_batches: Number of batches that are always run before the study can
+            converge.
+        seed: Seed of the initial sample.
+    """
+
+    def __init__(self, space: CombinationSpace, batch_size: int, budget: int,
+                 criterion: str = 'Expected improvement', tolerance: float = 0.01,
+                 min_batches: int = 2, seed: int = 0):
+        self.space = space
+        self.batch_size = batch_size
+        self.budget = min(budget, len(space))
+        self.criterion = criterion
+        self.tolerance = tolerance
+        self.min_batches = min_batches
+        self.seed = seed
+        self.evaluated: Dict[int, float] = {}
+        self.jobs: List[str] = []
+        self.pending: List[int] = []
+        self.converged = False
+        self._proposal = None
+
+    @property
+    def done(self) -> bool:
+        """A boolean to note if the study has reached its budget or has converged."""
+        return self.converged or len(self.evaluated) >= self.budget
+
+    @property
+    def best(self) -> Optional[int]:
+        """Index of the combination with the lowest EUI so far."""
+        if not self.evaluated:
+            return None
+        return min(self.evaluated, key=self.evaluated.get)
+
+    def propose(self) -> List[int]:
+        """Get the indices of the combinations for the next batch.
+
+        The proposal is kept until the results of a batch are added.
+        """
+        if self._proposal is None:
+            self._proposal = self._propose()
+        return self._proposal
+
+    def _propose(self) -> List[int]:
+        size = min(self.batch_size, self.budget - len(self.evaluated))
+        if size <= 0:
+            return []
+
+        if len(self.evaluated) < 2:
+            initial = sample(self.space, 'Latin hypercube', size, self.seed)
+            indices = getattr(initial, 'indices', range(len(self.space)))
+            return [index for index in indices if index not in self.evaluated][:size]
+
+        parameters = list(self.space.parameters.keys())
+        indices = list(self.evaluated.keys())
+        x = np.array([[self.space[i][p] for p in parameters] for i in indices])
+        surrogate = Surrogate(parameters).fit(x, [self.evaluated[i] for i in indices])
+        mean, std = surrogate.predict_space(self.space)
+
+        if self.criterion == 'Uncertainty':
+            score = std
+        else:
+            score = expected_improvement(mean, std, self.evaluated[self.best])
+            # the options of a study can differ by much less than the EUI itself so
+            # the improvement is compared to the spread of the results so far
+            values = list(self.evaluated.values())
+            spread = max(values) - min(values)
+            if len(self.evaluated) >= self.min_batches * self.batch_size and \
+                    score.max() <= self.tolerance * spread:
+                self.converged = True
+                return []
+
+        score[indices] = -np.inf
+        batch = np.argsort(-score)[:size]
+        return [int(index) for index in batch if np.isfinite(score[index])]
+
+    def add_results(self, df: DataFrame, eui: List[float]) -> None:
+        """Add the results of a finished batch.
+
+        Args:
+            df: The runs dataframe of the batch job. Its option-no column is the index
+                of each combination in the space.
+            eui: EUI of the runs in the order of the dataframe rows.
+        """
+        for option_no, value in zip(df['option-no'], eui):
+            self.evaluated[int(option_no)] = value
+        self.pending = []
+        self._proposal = None
+
+    def results(self) -> DataFrame:
+        """Get the evaluated combinations and their EUI sorted by EUI."""
+        rows = []
+        for index, value in self.evaluated.items():
+            row = {ARGUMENT_NAMES.get(key, key): item
+                   for key, item in self.space[index].items()}
+            row['option-no'] = index
+            row['EUI'] = value
+            rows.append(row)
+        return DataFrame(rows).sort_values('EUI') if rows else DataFrame()
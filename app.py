@@ -9,10 +9,11 @@ from model import set_model
 from params import get_design_combinations
 from visualize import visualize
 from options import get_design_options
-from results import results
+from results import load_results, matching_options, results
 from pollination_streamlit_io import special
 from streamlit.server.server import Server
-from helper import load_css
+from helper import get_workspace, load_css
+from diagnostics import diagnostics
 
 
 st.set_page_config(
@@ -34,6 +35,10 @@ def main():
 
     st.title('Parametric Study')
 
+    get_workspace()
+
+    diagnostics()
+
     step = stx.stepper_bar(
         steps=['Getting Started', 'Parameters',
                'Visualize', 'Submit', 'Results', 'Visualize'],
@@ -62,14 +67,11 @@ def main():
                      )
             return
         else:
-            design_options, post_viz_dict = get_design_options(
-                st.session_state.design_combinations, st.session_state.param_abbrevs)
-            st.session_state.design_options = design_options
-            st.session_state.post_viz_dict = post_viz_dict
+            st.session_state.design_options = get_design_options(
+                st.session_state.design_combinations)
 
     elif step == 3:
-        if 'design_options' not in st.session_state or \
-                'post_viz_dict' not in st.session_state:
+        if 'design_options' not in st.session_state:
             st.error(
                 'You should take a look list of design options and visualize a few of them'
                 ' before you submit them to Pollination.'
@@ -82,27 +84,32 @@ def main():
                 st.session_state.job_url = job_url
 
     elif step == 4:
-        if 'job_url' not in st.session_state:
+        design_options = st.session_state.get('design_options', None)
+        results_table = load_results()
+        if results_table is not None:
+            design_options = matching_options(design_options, results_table)
+        elif 'job_url' not in st.session_state:
             st.error(
-                'Go back to step 4 to submit the job to Pollination first.'
+                'Go back to step 4 to submit the job to Pollination first or load '
+                'the results from a Parquet file.'
             )
             return
         else:
-            df, eui = results(st.session_state.job_url)
+            results_table = results(st.session_state.job_url)
 
-            if len(df.columns) != 0 and len(eui) != 0:
-                st.session_state.df = df
-                st.session_state.eui = eui
+        if results_table is not None and len(results_table) != 0:
+            st.session_state.results_table = results_table
+            st.session_state.results_options = design_options
 
     elif step == 5:
-        if 'eui' not in st.session_state or 'df' not in st.session_state:
+        if 'results_table' not in st.session_state:
             st.error(
                 'Go back to step 5 to download the results.'
             )
             return
         else:
-            visualize(st.session_state.post_viz_dict,
-                      st.session_state.df, st.session_state.eui)
+            visualize(st.session_state.get('results_options', None),
+                      st.session_state.results_table)
 
 
 if __name__ == '__main__':
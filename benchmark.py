@@ -0,0 +1,380 @@
+"""Benchmark the steps of a parametric study on synthetic models and parameter grids.
+
+The Pollination API is replaced with a local stand-in that waits for a configurable
+latency on every request so the benchmark doesn't need an account or a network.
+
+    python benchmark.py --output benchmark.json
+    python benchmark.py --baseline benchmark.json
+
+A run with a baseline reports the stages that are slower than the baseline and exits
+with an error if any stage is slower than the tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import platform
+import tempfile
+import subprocess
+from io import BytesIO
+from pathlib import Path
+from statistics import median
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+# use a cache folder of the benchmark so the numbers don't depend on the cache of the
+# app. It must be set before the cache module is imported.
+_TEMPORARY_CACHE = 'PARAMETRIC_STUDY_CACHE' not in os.environ
+if _TEMPORARY_CACHE:
+    os.environ['PARAMETRIC_STUDY_CACHE'] = tempfile.mkdtemp(
+        prefix='parametric-study-benchmark-')
+
+from honeybee.model import Model as HBModel
+from honeybee.room import Room
+from ladybug_geometry.geometry3d.pointvector import Point3D
+from pandas import DataFrame
+from queenbee.job.job import JobStatusEnum
+from queenbee.job.run import RunStatusEnum
+
+from cache import CACHE_FOLDER
+from combinations import CombinationSpace
+from result_store import ResultStore
+from store import OptionStore
+from study import collect_eui, generate_options, job_arguments, wait_for_job
+from upload import upload_files
+
+
+# number of rooms of the synthetic models. Every room has 6 faces.
+ROOM_COUNTS = [1, 8, 27]
+
+# parameter grids of increasing size
+GRIDS = {
+    'small': {
+        'Window to wall ratio': [0.2, 0.4, 0.6, 0.8],
+        'Louver count': [0, 2],
+        'Louver depth': [0.5, 1.0],
+    },
+    'medium': {
+        'Window to wall ratio': [round(0.1 * i, 1) for i in range(1, 10)],
+        'Louver count': [0, 1, 2, 3, 4],
+        'Louver depth': [0.25, 0.5, 0.75, 1.0],
+    },
+    'large': {
+        'Window to wall ratio': [round(0.05 * i, 2) for i in range(2, 19)],
+        'Louver count': list(range(10)),
+        'Louver depth': [0.25, 0.5, 0.75, 1.0, 1.5, 2.0],
+    },
+}
+
+
+class FakeApiClient:
+    """A stand-in for the Pollination API client that only waits.
+
+    Args:
+        latency: Number of seconds that every request takes.
+        bandwidth: Upload and download speed in bytes per second.
+    """
+
+    def __init__(self, latency: float = 0.05, bandwidth: float = 50 * 1024 ** 2):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.requests = 0
+
+    def wait(self, size: int = 0) -> None:
+        self.requests += 1
+        time.sleep(self.latency + size / self.bandwidth)
+
+
+class FakeRun:
+    """A run of a FakeJob that succeeds at finish_time."""
+
+    def __init__(self, job: 'FakeJob', position: int, finish_time: float):
+        self.job = job
+        self.id = f'{job.id}-run-{position}'
+        self.position = position
+        self.finish_time = finish_time
+
+    @property
+    def status(self):
+        status = RunStatusEnum.succeeded if time.time() >= self.finish_time \
+            else RunStatusEnum.running
+        return SimpleNamespace(status=status)
+
+    def download_zipped_output(self, output_name: str) -> BytesIO:
+        data = BytesIO()
+        with zipfile.ZipFile(data, 'w') as zip_file:
+            zip_file.writestr(f'{output_name}/eui.json',
+                              json.dumps({'eui': 100.0 + self.position % 50}))
+        data.seek(0)
+        self.job.client.wait(len(data.getvalue()))
+        return data
+
+
+class FakeJob:
+    """A stand-in for a Pollination job whose runs finish one after the other.
+
+    Args:
+        owner: The account of the job.
+        project: The project of the job.
+        arguments: The arguments of every run.
+        client: A FakeApiClient.
+        run_time: Number of seconds until the last run finishes.
+    """
+
+    def __init__(self, owner: str, project: str, arguments: List[dict],
+                 client: FakeApiClient, run_time: float = 1.0):
+        self.owner = owner
+        self.project = project
+        self.id = f'job-{time.time_ns()}'
+        self.arguments = arguments
+        self.client = client
+        start = time.time()
+        count = max(len(arguments), 1)
+        self._runs = [FakeRun(self, num, start + run_time * (num + 1) / count)
+                      for num in range(len(arguments))]
+
+    @property
+    def status(self):
+        self.client.wait()
+        finished = all(time.time() >= run.finish_time for run in self._runs)
+        return SimpleNamespace(
+            status=JobStatusEnum.completed if finished else JobStatusEnum.running)
+
+    @property
+    def runs(self) -> List[FakeRun]:
+        self.client.wait()
+        return list(self._runs)
+
+    @property
+    def runs_dataframe(self):
+        self.client.wait()
+        return SimpleNamespace(dataframe=DataFrame(self.arguments))
+
+
+class FakeNewJob:
+    """A stand-in for a new Pollination job."""
+
+    def __init__(self, owner: str, project: str, client: FakeApiClient,
+                 run_time: float = 1.0):
+        self.owner = owner
+        self.project = project
+        self.client = client
+        self.run_time = run_time
+        self.arguments = []
+
+    def upload_artifact(self, file_path: Path, target_folder: str) -> str:
+        self.client.wait(file_path.stat().st_size)
+        return f'{target_folder}/{file_path.name}'
+
+    def create(self) -> FakeJob:
+        self.client.wait()
+        return FakeJob(self.owner, self.project, self.arguments, self.client,
+                       self.run_time)
+
+
+def synthetic_model(room_count: int) -> HBModel:
+    """Create a model of a cubic grid of rooms with windows on every outdoor wall."""
+    side = max(round(room_count ** (1 / 3)), 1)
+    rooms = []
+    for num in range(room_count):
+        x, y, z = num % side, (num // side) % side, num // (side * side)
+        rooms.append(
+            Room.from_box(f'room_{num}', 5, 5, 3, origin=Point3D(x * 5, y * 5, z * 3)))
+    Room.solve_adjacency(rooms, 0.01)
+    for room in rooms:
+        for face in room.faces:
+            if face.type.name == 'Wall' and face.boundary_condition.name == 'Outdoors':
+                face.apertures_by_ratio(0.4, 0.01)
+    return HBModel(f'benchmark_{room_count}', rooms=rooms)
+
+
+def timed(function: Callable[[], object], repeat: int = 1,
+          setup: Callable[[], None] = None) -> Dict[str, float]:
+    """Time a function and get the minimum and the median of several calls."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': median(times)}
+
+
+def _clear_options() -> None:
+    shutil.rmtree(CACHE_FOLDER.joinpath('design_options').as_posix(), ignore_errors=True)
+
+
+def _clear_vtkjs() -> None:
+    shutil.rmtree(CACHE_FOLDER.joinpath('vtkjs').as_posix(), ignore_errors=True)
+
+
+def benchmark(room_counts: List[int], grids: List[str], client: FakeApiClient,
+              repeat: int = 3, workers: int = None,
+              log: Callable[[str], None] = print) -> List[dict]:
+    """Run the benchmark and get a record for every stage, model and grid."""
+    records = []
+    folder = Path(tempfile.mkdtemp(prefix='parametric-study-models-'))
+
+    def record(stage: str, faces: int, runs: int, timing: Dict[str, float]):
+        records.append({'stage': stage, 'faces': faces, 'runs': runs, **timing})
+        log(f'{stage:<24} {faces:>6} faces {runs:>6} runs '
+            f'{timing["min"]:>9.4f} s (median {timing["median"]:.4f} s)')
+
+    for grid in grids:
+        input_params = GRIDS[grid]
+        space = CombinationSpace(input_params)
+        # the same work as params.calculate_combination without the Streamlit UI
+        record('calculate_combination', 0, len(space), timed(
+            lambda: len(CombinationSpace(input_params)), repeat))
+        record('iterate_combinations', 0, len(space), timed(
+            lambda: sum(1 for _ in CombinationSpace(input_params)), repeat))
+
+    for room_count in room_counts:
+        model = synthetic_model(room_count)
+        faces = len(model.faces)
+        model_file = folder.joinpath(f'{model.identifier}.hbjson')
+        model.to_hbjson(model.identifier, folder.as_posix())
+
+        try:
+            from converter import create_vtkjs
+        except ImportError:
+            log('honeybee-vtk is not installed. Skipping create_vtkjs.')
+        else:
+            record('create_vtkjs', faces, 1, timed(
+                lambda: create_vtkjs(model_file), repeat, setup=_clear_vtkjs))
+
+        for grid in grids:
+            space = CombinationSpace(GRIDS[grid])
+            runs = len(space)
+
+            # the same work as options.generate_design_options and the materialize
+            # step of submit.create_job without the Streamlit UI
+            def generate():
+                return generate_options(OptionStore(model_file), space, workers)
+
+            record('generate_options', faces, runs,
+                   timed(generate, 1, setup=_clear_options))
+            record('generate_options_cached', faces, runs, timed(generate, repeat))
+            design_options, model_files = generate()
+
+            def upload(uploaded=None):
+                new_job = FakeNewJob('benchmark', 'benchmark', client)
+                return upload_files(new_job, model_files, uploaded=uploaded)
+
+            record('upload', faces, runs, timed(upload, 1))
+            uploaded = {}
+            upload(uploaded)
+            record('upload_deduplicated', faces, runs,
+                   timed(lambda: upload(uploaded), repeat))
+
+            arguments = job_arguments(
+                design_options, upload(uploaded), 'weather.epw', 'weather.ddy')
+            job = FakeJob('benchmark', 'benchmark', arguments, client, run_time=0)
+            store = ResultStore(folder.joinpath(f'{job.id}.db'))
+            job_runs = job.runs
+            selection = list(range(len(job_runs)))
+            record('get_eui', faces, runs, timed(
+                lambda: collect_eui(store, job, job_runs, selection), 1))
+            record('get_eui_stored', faces, runs, timed(
+                lambda: collect_eui(store, job, job_runs, selection), repeat))
+
+            polled = FakeNewJob('benchmark', 'benchmark', client, run_time=1.0)
+            polled.arguments = arguments
+            record('poll_and_ingest', faces, runs, timed(
+                lambda: wait_for_job(
+                    polled.create(), ResultStore(folder.joinpath('polled.db')),
+                    min_interval=0.05, max_interval=0.5), 1))
+
+    shutil.rmtree(folder.as_posix(), ignore_errors=True)
+    return records
+
+
+def compare(records: List[dict], baseline: List[dict], tolerance: float,
+            min_time: float = 0.01) -> List[str]:
+    """Get a message for every stage that is slower than the baseline.
+
+    Stages that take less than min_time seconds are too noisy to compare.
+    """
+    reference = {(r['stage'], r['faces'], r['runs']): r['min'] for r in baseline}
+    regressions = []
+    for r in records:
+        previous = reference.get((r['stage'], r['faces'], r['runs']))
+        if previous is None or max(previous, r['min']) < min_time:
+            continue
+        if r['min'] > previous * tolerance:
+            regressions.append(
+                f'{r["stage"]} with {r["faces"]} faces and {r["runs"]} runs is '
+                f'{r["min"] / previous:.2f}x slower ({previous:.4f} s to '
+                f'{r["min"]:.4f} s).')
+    return regressions
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+            cwd=Path(__file__).parent.as_posix()).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark a parametric study.')
+    parser.add_argument('--rooms', type=int, nargs='+', default=ROOM_COUNTS,
+                        help='Number of rooms of the synthetic models.')
+    parser.add_argument('--grids', nargs='+', choices=list(GRIDS),
+                        default=['small', 'medium'], help='Parameter grids to run.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of times to repeat the warm stages.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes to build the design options.')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Latency of every API request in seconds.')
+    parser.add_argument('--bandwidth', type=float, default=50,
+                        help='Upload and download speed in MB/s.')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='Path to a JSON file to write the numbers to.')
+    parser.add_argument('--baseline', type=Path, default=None,
+                        help='Path to the JSON file of an earlier run to compare to.')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='Slowdown over the baseline that is a regression.')
+    options = parser.parse_args(args)
+
+    client = FakeApiClient(options.latency, options.bandwidth * 1024 ** 2)
+    records = benchmark(options.rooms, options.grids, client, options.repeat,
+                        options.workers)
+    if _TEMPORARY_CACHE:
+        shutil.rmtree(CACHE_FOLDER.as_posix(), ignore_errors=True)
+
+    if options.output:
+        options.output.write_text(json.dumps({
+            'commit': _commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'latency': options.latency,
+            'bandwidth': options.bandwidth,
+            'records': records,
+        }, indent=2))
+
+    if options.baseline:
+        baseline = json.loads(options.baseline.read_text())
+        if (baseline['latency'], baseline['bandwidth']) != \
+                (options.latency, options.bandwidth):
+            print('The baseline uses a different latency or bandwidth.', file=sys.stderr)
+        regressions = compare(records, baseline['records'], options.tolerance)
+        for message in regressions:
+            print(message, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Content-addressed file and memory caches shared by the app sessions."""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+CACHE_FOLDER = Path(os.environ.get(
+    'PARAMETRIC_STUDY_CACHE',
+    Path(tempfile.gettempdir()).joinpath('parametric-study').as_posix()
+))
+
+# file hashes keyed by (path, modified time, size) so unchanged files are not
+# hashed again on every rerun
+_FILE_HASHES: Dict[Tuple[str, int, int], str] = {}
+
+# files that are in use and must not be evicted, with the number of pins of each
+_PINNED: Counter = Counter()
+_pin_lock = threading.Lock()
+
+
+def cache_folder(name: str) -> Path:
+    """Get a sub-folder of the cache folder and create it if it doesn't exist."""
+    folder = CACHE_FOLDER.joinpath(name)
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def hash_file(file_path: Path) -> str:
+    """Get the SHA-256 hash of the content of a file."""
+    stat = file_path.stat()
+    memo_key = (file_path.as_posix(), stat.st_mtime_ns, stat.st_size)
+    if memo_key not in _FILE_HASHES:
+        sha = hashlib.sha256()
+        with open(file_path.as_posix(), 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        _FILE_HASHES[memo_key] = sha.hexdigest()
+    return _FILE_HASHES[memo_key]
+
+
+def remember_hash(file_path: Path, digest: str) -> None:
+    """Record the hash of a file that is already known, for instance while writing it."""
+    stat = file_path.stat()
+    _FILE_HASHES[(file_path.as_posix(), stat.st_mtime_ns, stat.st_size)] = digest
+
+
+def hash_data(data) -> str:
+    """Get the SHA-256 hash of a JSON serializable object.
+
+    Dictionary keys are sorted so the hash doesn't depend on their order.
+    """
+    content = json.dumps(data, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def touch(file_path: Path) -> None:
+    """Mark a cached file as recently used.
+
+    A known hash of the file is kept so the new modified time doesn't make hash_file
+    read the file again.
+    """
+    try:
+        stat = file_path.stat()
+        os.utime(file_path.as_posix())
+    except FileNotFoundError:
+        return
+    digest = _FILE_HASHES.pop((file_path.as_posix(), stat.st_mtime_ns, stat.st_size), None)
+    if digest is not None:
+        try:
+            remember_hash(file_path, digest)
+        except FileNotFoundError:
+            pass
+
+
+class Pins:
+    """Files that are in use and are not evicted until the pins are released.
+
+    Use it as a context manager to release the pins at the end of a block.
+
+    Args:
+        file_paths: Paths to the files to pin.
+    """
+
+    def __init__(self, file_paths: Iterable[Path] = ()):
+        self._paths: List[str] = []
+        for file_path in file_paths:
+            self.add(file_path)
+
+    def add(self, file_path: Path) -> None:
+        """Pin a file."""
+        path = file_path.as_posix()
+        with _pin_lock:
+            _PINNED[path] += 1
+        self._paths.append(path)
+
+    def release(self) -> None:
+        """Release all the pins."""
+        with _pin_lock:
+            for path in self._paths:
+                _PINNED[path] -= 1
+                if _PINNED[path] <= 0:
+                    del _PINNED[path]
+        self._paths = []
+
+    def __enter__(self) -> 'Pins':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+def is_pinned(file_path: Path) -> bool:
+    """A boolean to note if a file is pinned."""
+    with _pin_lock:
+        return file_path.as_posix() in _PINNED
+
+
+def has_pinned(folder: Path) -> bool:
+    """A boolean to note if a folder has any pinned files."""
+    prefix = folder.as_posix().rstrip('/') + '/'
+    with _pin_lock:
+        return any(path.startswith(prefix) for path in _PINNED)
+
+
+def list_files(folder: Path, pattern: str = '*') -> List[Tuple[float, int, Path]]:
+    """Get the last used time, the size and the path of the files in a folder.
+
+    Args:
+        folder: Path to the folder.
+        pattern: A glob pattern for the files. Sub-folders are searched too.
+    """
+    files = []
+    for file_path in folder.rglob(pattern):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue
+        if file_path.is_file():
+            files.append((stat.st_mtime, stat.st_size, file_path))
+    return files
+
+
+def remove_least_recent(files: List[Tuple[float, int, Path]], size: int) -> int:
+    """Remove the least recently used files until at least size bytes are removed.
+
+    Pinned files are never removed.
+
+    Args:
+        files: A list of files from list_files.
+        size: Number of bytes to remove.
+
+    Returns:
+        The number of bytes that were removed.
+    """
+    removed = 0
+    for _, file_size, file_path in sorted(files, key=lambda f: f[0]):
+        if removed >= size:
+            break
+        if is_pinned(file_path):
+            continue
+        try:
+            file_path.unlink()
+        except FileNotFoundError:
+            continue
+        removed += file_size
+    return removed
+
+
+def evict(folder: Path, max_size: int, pattern: str = '*') -> int:
+    """Remove the least recently used files in a folder until it fits in max_size.
+
+    Args:
+        folder: Path to the cache folder.
+        max_size: Maximum size of the matching files in bytes.
+        pattern: A glob pattern for the files that can be removed.
+
+    Returns:
+        The number of bytes that were removed.
+    """
+    files = list_files(folder, pattern)
+    total = sum(size for _, size, _ in files)
+    if total <= max_size:
+        return 0
+    return remove_least_recent(files, total - max_size)
+
+
+class MemoryCache:
+    """A thread-safe in-memory LRU cache that is bounded by the size of its items.
+
+    Args:
+        max_size: Maximum total size of the items in bytes.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Get an item and mark it as recently used. Returns None if it is missing."""
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key: str, value, size: int) -> None:
+        """Add an item and evict the least recently used items to fit max_size."""
+        if size > self.max_size:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, removed) = self._items.popitem(last=False)
+                self.size -= removed
@@ -0,0 +1,82 @@
+"""A lazy space of design combinations."""
+
+import itertools
+from functools import reduce
+from typing import Dict, Iterator, List, Union
+
+
+# recipe argument of each study parameter. They are also the columns of the runs
+# dataframe of a job.
+ARGUMENT_NAMES = {
+    'Window to wall ratio': 'window-to-wall-ratio',
+    'Louver count': 'louver-count',
+    'Louver depth': 'louver-depth',
+}
+
+
+class CombinationSpace:
+    """All the combinations of a set of parameter values.
+
+    The combinations are in the same order as itertools.product of the parameter
+    values but they are only created when they are accessed.
+
+    Args:
+        input_params: A dictionary of parameter names and the list of their values.
+    """
+
+    def __init__(self, input_params: Dict[str, list]):
+        self.parameters = {key: list(values) for key, values in input_params.items()}
+        self._keys = list(self.parameters.keys())
+        self._sizes = [len(values) for values in self.parameters.values()]
+
+    def __len__(self) -> int:
+        return reduce(lambda total, size: total * size, self._sizes, 1)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('Design combination index out of range.')
+
+        # the last parameter changes the fastest as in itertools.product
+        values = [None] * len(self._keys)
+        for position in reversed(range(len(self._keys))):
+            index, value_index = divmod(index, self._sizes[position])
+            values[position] = self.parameters[self._keys[position]][value_index]
+        return dict(zip(self._keys, values))
+
+    def __iter__(self) -> Iterator[dict]:
+        values = (self.parameters[key] for key in self._keys)
+        for combination in itertools.product(*values):
+            yield dict(zip(self._keys, combination))
+
+    def __repr__(self) -> str:
+        return f'CombinationSpace: {len(self)} combinations of {self._keys}'
+
+    def __eq__(self, other) -> bool:
+        # spaces are created again on every rerun of the app so they are compared by
+        # their parameter values
+        return isinstance(other, CombinationSpace) and self.parameters == other.parameters
+
+    def __hash__(self) -> int:
+        return hash(tuple((key, tuple(values)) for key, values in self.parameters.items()))
+
+    def index(self, design_combination: dict) -> int:
+        """Get the index of a design combination in the space."""
+        index = 0
+        for key, size in zip(self._keys, self._sizes):
+            index = index * size + self.parameters[key].index(design_combination[key])
+        return index
+
+    def chunks(self, size: int) -> Iterator[List[dict]]:
+        """Iterate over the combinations in lists of a given size."""
+        iterator = iter(self)
+        while True:
+            chunk = list(itertools.islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
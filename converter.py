@@ -0,0 +1,129 @@
+"""Convert HBJSON models to VTKJS on a background worker with a shared cache.
+
+Converted files are keyed by the hash of the HBJSON content and shared by all the
+sessions of the app.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from honeybee_vtk.model import Model as VTKModel
+
+from cache import cache_folder, evict, hash_file, touch
+from metrics import add_bytes, span
+
+
+# maximum size of the VTKJS cache in bytes
+VTKJS_CACHE_SIZE = int(os.environ.get('VTKJS_CACHE_SIZE', 1024 ** 3))
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='vtkjs')
+# prefetches run on their own worker so they never queue ahead of a requested model
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vtkjs-prefetch')
+_pending: Dict[str, Future] = {}
+_lock = threading.Lock()
+# incremented on every requested conversion. Prefetches from an older generation are
+# stale and skipped.
+_generation = 0
+
+
+def _convert(hb_model_path: Path, key: str) -> Path:
+    vtkjs_folder = cache_folder('vtkjs')
+    vtkjs_file = vtkjs_folder.joinpath(f'{key}.vtkjs')
+    if vtkjs_file.is_file():
+        touch(vtkjs_file)
+        return vtkjs_file
+
+    # convert in a temporary folder first so other sessions never read a partial file
+    temp_folder = Path(tempfile.mkdtemp(dir=vtkjs_folder.as_posix()))
+    try:
+        with span('vtkjs'):
+            model = VTKModel.from_hbjson(hb_model_path.as_posix())
+            model.to_vtkjs(folder=temp_folder.as_posix(), name=key)
+        os.replace(temp_folder.joinpath(f'{key}.vtkjs').as_posix(), vtkjs_file.as_posix())
+        add_bytes('vtkjs', read=hb_model_path.stat().st_size,
+                  written=vtkjs_file.stat().st_size)
+    finally:
+        shutil.rmtree(temp_folder.as_posix(), ignore_errors=True)
+
+    evict(vtkjs_folder, VTKJS_CACHE_SIZE, '*.vtkjs')
+    return vtkjs_file
+
+
+def _done(key: str, future: Future) -> None:
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def convert(hb_model_path: Path) -> Future:
+    """Convert an HBJSON model to VTKJS on the background worker.
+
+    Requests for a model that is already being converted share the same conversion.
+
+    Returns:
+        A future for the path to the VTKJS file.
+    """
+    global _generation
+    key = hash_file(hb_model_path)
+    with _lock:
+        _generation += 1
+        future = _pending.get(key)
+        created = future is None
+        if created:
+            future = _executor.submit(_convert, hb_model_path, key)
+            _pending[key] = future
+    if created:
+        future.add_done_callback(lambda f: _done(key, f))
+    return future
+
+
+def create_vtkjs(hb_model_path: Path) -> Path:
+    """Get the path to the VTKJS file of an HBJSON model and convert it if needed."""
+    if not hb_model_path:
+        return
+
+    vtkjs_file = cache_folder('vtkjs').joinpath(f'{hash_file(hb_model_path)}.vtkjs')
+    if vtkjs_file.is_file():
+        touch(vtkjs_file)
+        return vtkjs_file
+    return convert(hb_model_path).result()
+
+
+def prefetch(resolve: Callable[[], Path]) -> None:
+    """Convert a model in the background before it is requested.
+
+    Prefetches run one at a time on their own worker. A prefetch that has not started
+    when another model is requested is skipped.
+
+    Args:
+        resolve: A function that returns the path to the HBJSON model. It runs on the
+            background worker so it can also write the model.
+    """
+    generation = _generation
+
+    def _prefetch():
+        if generation != _generation:
+            return
+        hb_model_path = resolve()
+        if not hb_model_path:
+            return
+        key = hash_file(hb_model_path)
+        with _lock:
+            if key in _pending:
+                return
+            future = Future()
+            _pending[key] = future
+        # requests for the model while it is prefetched share this conversion
+        try:
+            future.set_result(_convert(hb_model_path, key))
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            _done(key, future)
+
+    _prefetch_executor.submit(_prefetch)
@@ -0,0 +1,45 @@
+"""A diagnostics panel with the timing, memory and I/O counters of the app."""
+
+import streamlit as st
+from pandas import DataFrame
+
+from metrics import METRICS
+from workspace import usage
+
+
+def diagnostics():
+    """Render the diagnostics panel in the sidebar if it is turned on."""
+    with st.sidebar:
+        if not st.checkbox('Show diagnostics', key='show-diagnostics'):
+            return
+
+        snapshot = METRICS.snapshot()
+        st.metric('Peak memory', f'{snapshot["peak_memory"] / 1024 ** 2:.0f} MB')
+
+        if snapshot['stages']:
+            stages = DataFrame.from_dict(snapshot['stages'], orient='index')
+            stages['MB read'] = stages.pop('bytes_read') / 1024 ** 2
+            stages['MB written'] = stages.pop('bytes_written') / 1024 ** 2
+            stages['MB memory growth'] = stages.pop('memory_growth') / 1024 ** 2
+            st.dataframe(stages.sort_values('seconds', ascending=False))
+        else:
+            st.write('Nothing is recorded yet.')
+
+        st.caption('Disk usage')
+        disk = DataFrame.from_dict(usage(), orient='index')
+        if 'workspace' in st.session_state:
+            disk.loc['this session'] = st.session_state.workspace.usage()
+        if len(disk):
+            disk['MB'] = disk.pop('size') / 1024 ** 2
+            st.dataframe(disk)
+
+        if snapshot['spans']:
+            st.caption('Recent steps')
+            st.dataframe(DataFrame(snapshot['spans'][::-1]).head(20))
+
+        st.download_button('Download as JSON', data=METRICS.to_json(),
+                           file_name='metrics.json', mime='application/json')
+        st.download_button('Download as OpenMetrics', data=METRICS.to_openmetrics(),
+                           file_name='metrics.txt', mime='text/plain')
+        if st.button('Reset counters'):
+            METRICS.reset()
@@ -0,0 +1,193 @@
+"""Download the outputs of the runs of a Pollination job."""
+
+import os
+import json
+import zipfile
+import threading
+from pathlib import Path, PurePosixPath
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from cache import touch
+from metrics import add_bytes, span
+
+
+def extract_eui(res_zip: BinaryIO) -> float:
+    """Extract EUI data from the eui.JSON file in a zipped run output.
+
+    The file is read from the zip in memory without extracting it to disk.
+    """
+    with span('extract_eui'), zipfile.ZipFile(res_zip) as zip_folder:
+        eui_file = next(
+            name for name in zip_folder.namelist()
+            if name.split('/')[-1] == 'eui.json'
+        )
+        with zip_folder.open(eui_file) as file:
+            data = json.load(file)
+            return data['eui']
+
+
+def download_eui(run) -> float:
+    """Download the EUI of a run."""
+    with span('download_eui'):
+        res_zip = run.download_zipped_output('eui')
+    if hasattr(res_zip, 'getbuffer'):
+        add_bytes('download_eui', read=res_zip.getbuffer().nbytes)
+    return extract_eui(res_zip)
+
+
+def fetch_eui(runs: list, workers: int = 16) -> List[float]:
+    """Download the EUI of a list of runs concurrently.
+
+    Args:
+        runs: A list of runs of a job.
+        workers: Maximum number of concurrent downloads.
+
+    Returns:
+        A list of EUI values in the same order as the runs.
+    """
+    eui = [None] * len(runs)
+    if not runs:
+        return eui
+
+    index = {run.id: num for num, run in enumerate(runs)}
+    with ThreadPoolExecutor(max_workers=min(workers, len(runs))) as executor:
+        futures = {run.id: executor.submit(download_eui, run) for run in runs}
+        for run_id, future in futures.items():
+            eui[index[run_id]] = future.result()
+
+    return eui
+
+
+class ModelFetcher:
+    """Get the input models of the runs of a job when they are needed.
+
+    The artifacts of the models are resolved in the background as soon as the
+    fetcher is created but a model is only downloaded when it is requested or
+    prefetched. A local HBJSON with the same content is used instead of a download.
+
+    Args:
+        job: The job of the runs.
+        folder: Path to the folder to download the models to.
+        local: A function that gets the path to a local HBJSON for an option number
+            and the name of its artifact, or None if there is no local HBJSON with
+            the same content. It runs on the download workers so it can also write
+            the HBJSON.
+        workers: Maximum number of concurrent downloads.
+    """
+
+    def __init__(self, job, folder: Path,
+                 local: Callable[[int, str], Optional[Path]] = None, workers: int = 4):
+        self.job = job
+        self.folder = folder
+        self.local = local
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix='models')
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._resolved = self._executor.submit(self._resolve)
+
+    def _resolve(self) -> Tuple[Dict[str, object], Dict[int, str]]:
+        # every model is in its own folder of the model inputs
+        folders = self.job.list_artifacts('inputs/model')
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            children = executor.map(lambda folder: folder.list_children()[0], folders)
+            artifacts = {artifact.name: artifact for artifact in children}
+
+        df = self.job.runs_dataframe.dataframe
+        options = {}
+        if 'model' in df.columns:
+            options = {
+                int(option_no): PurePosixPath(str(model)).name
+                for option_no, model in zip(df['option-no'], df['model'])
+            }
+        return artifacts, options
+
+    @property
+    def resolved(self) -> bool:
+        """A boolean to note if the artifacts of the models are resolved."""
+        return self._resolved.done() and self._resolved.exception() is None
+
+    @property
+    def resolving(self) -> bool:
+        """A boolean to note if the artifacts of the models are still being resolved."""
+        return not self._resolved.done()
+
+    @property
+    def options(self) -> Dict[int, str]:
+        """The name of the model artifact of every option number of the job.
+
+        It is empty until the artifacts are resolved so it never waits for them. It
+        raises the error of the resolution if it failed.
+        """
+        if not self._resolved.done():
+            return {}
+        return self._resolved.result()[1]
+
+    def _get(self, option_no: int) -> Path:
+        # the artifacts are resolved on the same workers before any download starts
+        name = self._resolved.result()[1][option_no]
+        local = self.local(option_no, name) if self.local else None
+        if local is not None:
+            return local
+
+        hbjson_file = self.folder.joinpath(name)
+        if hbjson_file.is_file():
+            touch(hbjson_file)
+            return hbjson_file
+
+        artifacts = self._resolved.result()[0]
+        with span('download_model'):
+            data = artifacts[name].download().read()
+        # write to a temporary file first so a partial file is never used
+        self.folder.mkdir(parents=True, exist_ok=True)
+        temp_file = self.folder.joinpath(f'{name}.{threading.get_ident()}.tmp')
+        temp_file.write_bytes(data)
+        os.replace(temp_file.as_posix(), hbjson_file.as_posix())
+        add_bytes('download_model', read=len(data), written=len(data))
+        return hbjson_file
+
+    def _done(self, option_no: int, future: Future) -> None:
+        with self._lock:
+            if self._pending.get(option_no) is future:
+                del self._pending[option_no]
+
+    def fetch(self, option_no: int) -> Future:
+        """Get the model of a design option on the download workers.
+
+        It doesn't wait for the artifacts to be resolved. Requests for a model that is
+        already being fetched share the same download.
+
+        Returns:
+            A future for the path to the HBJSON of the model. It raises a KeyError if
+            the option number is not in the job.
+        """
+        with self._lock:
+            future = self._pending.get(option_no)
+            created = future is None
+            if created:
+                future = self._executor.submit(self._get, option_no)
+                self._pending[option_no] = future
+        if created:
+            future.add_done_callback(lambda f: self._done(option_no, f))
+        return future
+
+    def get(self, option_no: int) -> Path:
+        """Get the path to the model of a design option and download it if needed."""
+        return self.fetch(option_no).result()
+
+    def prefetch(self, option_numbers: Iterable[int]) -> None:
+        """Start to get the models of design options before they are requested."""
+        options = self.options
+        for option_no in option_numbers:
+            if option_no in options:
+                self.fetch(option_no)
+
+    def close(self) -> None:
+        """Cancel the downloads that have not started and stop the workers."""
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,162 @@
+"""Build design options by applying the study parameters to a base Honeybee model.
+
+This module doesn't depend on Streamlit so it can be used from worker processes.
+"""
+
+import os
+import math
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Tuple
+
+from honeybee.model import Model as HBModel
+from honeybee.boundarycondition import Outdoors
+
+
+# base model for the worker processes. It is loaded once per worker.
+_BASE_MODEL = None
+
+
+def faces_with_aperture(model: HBModel) -> list:
+    """Get the outdoor faces of a model that have apertures."""
+    return [face for face in model.faces if face.apertures and isinstance(
+        face.boundary_condition, Outdoors)]
+
+
+def has_louvers(design_combination: dict) -> bool:
+    """Check if a design combination adds louvers to the apertures."""
+    return 'Louver count' in design_combination and design_combination['Louver count'] > 0 \
+        and 'Louver depth' in design_combination and design_combination['Louver depth'] > 0
+
+
+def apply_apertures(model: HBModel, design_combination: dict) -> dict:
+    """Apply the window to wall ratio of a design combination to a model in place.
+
+    Returns a dictionary of the parameters that were applied to the model.
+    """
+    design_option = {}
+    if 'Window to wall ratio' not in design_combination:
+        return design_option
+
+    for face in faces_with_aperture(model):
+        face.apertures_by_ratio(design_combination['Window to wall ratio'])
+        design_option['Window to wall ratio'] = design_combination['Window to wall ratio']
+
+    return design_option
+
+
+def apply_louvers(model: HBModel, design_combination: dict) -> dict:
+    """Apply the louvers of a design combination to a model in place.
+
+    Returns a dictionary of the parameters that were applied to the model.
+    """
+    design_option = {}
+    if not has_louvers(design_combination):
+        return design_option
+
+    for face in faces_with_aperture(model):
+        for aperture in face.apertures:
+            aperture.louvers_by_count(
+                design_combination['Louver count'], design_combination['Louver depth'])
+            design_option['Louver count'] = design_combination['Louver count']
+            design_option['Louver depth'] = design_combination['Louver depth']
+
+    return design_option
+
+
+def apply_parameters(model: HBModel, design_combination: dict) -> dict:
+    """Apply a design combination to a model in place.
+
+    Returns a dictionary of the parameters that were applied to the model.
+    """
+    design_option = apply_apertures(model, design_combination)
+    design_option.update(apply_louvers(model, design_combination))
+    return design_option
+
+
+def _order_key(design_combination: dict) -> tuple:
+    """Sort key that groups design combinations by window to wall ratio first."""
+    return tuple(
+        (key not in design_combination, design_combination.get(key, 0))
+        for key in ('Window to wall ratio', 'Louver count', 'Louver depth')
+    )
+
+
+def _init_worker(base_model_path: str) -> None:
+    global _BASE_MODEL
+    _BASE_MODEL = HBModel.from_hbjson(base_model_path)
+
+
+def _build_chunk(chunk: List[Tuple[int, dict, str]],
+                 base_model: HBModel = None) -> List[Tuple[int, dict, str]]:
+    base_model = base_model or _BASE_MODEL
+    built = []
+    # the combinations are sorted by window to wall ratio so the model with the
+    # apertures of a ratio is built once and reused for all the louvers of that ratio
+    state_key, state, state_option = object(), None, None
+    for index, design_combination, hbjson_file in chunk:
+        key = design_combination.get('Window to wall ratio')
+        if key != state_key:
+            state = base_model.duplicate()
+            state_option = apply_apertures(state, design_combination)
+            state_key = key
+
+        design_option = dict(state_option)
+        if has_louvers(design_combination):
+            model = state.duplicate()
+            design_option.update(apply_louvers(model, design_combination))
+        else:
+            model = state
+        # write to a temporary file first so other sessions never read a partial file
+        temp_file = f'{hbjson_file[:-len(".hbjson")]}.{os.getpid()}.tmp.hbjson'
+        model.to_hbjson(temp_file)
+        os.replace(temp_file, hbjson_file)
+        built.append((index, design_option, hbjson_file))
+    return built
+
+
+def build_options(base_model_path: Path, tasks: List[Tuple[dict, Path]],
+                  workers: int = None,
+                  base_model: HBModel = None) -> Iterator[Tuple[int, dict, Path]]:
+    """Build design options on a process pool.
+
+    Args:
+        base_model_path: Path to the base HBJSON model.
+        tasks: A list of design combinations and the path to write each option to.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        base_model: The parsed base model if it is already loaded. It is only used
+            to build the options in this process and it is not changed.
+
+    Yields:
+        A tuple of (index, design_option, hbjson_file) for every task as soon as it is
+        written. Use the index to put the results back in the order of the tasks.
+    """
+    if not tasks:
+        return
+
+    indexed = [(index, design_combination, hbjson_file.as_posix())
+               for index, (design_combination, hbjson_file) in enumerate(tasks)]
+    # keep the combinations that share a window to wall ratio in the same chunk
+    indexed.sort(key=lambda task: _order_key(task[1]))
+
+    workers = min(workers or os.cpu_count() or 1, len(indexed))
+    if workers == 1:
+        # build in this process without touching the worker model so it is safe to
+        # call from several threads
+        base_model = base_model or HBModel.from_hbjson(base_model_path.as_posix())
+        for index, design_option, hbjson_file in _build_chunk(indexed, base_model):
+            yield index, design_option, Path(hbjson_file)
+        return
+
+    # a few chunks per worker to keep the progress moving without paying the
+    # overhead of sending one combination at a time
+    chunk_size = math.ceil(len(indexed) / (workers * 4))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(base_model_path.as_posix(),)) as executor:
+        futures = [executor.submit(_build_chunk, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for index, design_option, hbjson_file in future.result():
+                yield index, design_option, Path(hbjson_file)
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from workspace import Workspace, cleanup_in_background
+
 
 def load_css(file_name):
     """Load a local css file."""
@@ -14,3 +16,20 @@ def get_host() -> str:
     """
     st_query = st.experimental_get_query_params()
     return st_query['__platform__'][0] if '__platform__' in st_query else 'web'
+
+
+def get_workspace() -> Workspace:
+    """Get the workspace folder of the session and mark it as used.
+
+    The session is kept in its disk quota and expired sessions of the app are removed
+    in the background.
+    """
+    if 'workspace' not in st.session_state:
+        st.session_state.workspace = Workspace()
+        st.session_state.temp_folder = st.session_state.workspace.folder
+    workspace = st.session_state.workspace
+    workspace.touch()
+    if workspace.enforce_quota() > 0:
+        st.warning('The uploads of this session are larger than its disk quota.')
+    cleanup_in_background()
+    return workspace
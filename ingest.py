@@ -0,0 +1,184 @@
+"""Parse and validate an input model once and reuse it in the next steps of the study.
+
+Models are parsed on a background worker and keyed by the hash of the HBJSON content.
+The parsed model is kept in memory and its summary is written to the shared cache so
+the model is not parsed again on every rerun of the app.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Dict, Optional
+
+from honeybee.model import Model as HBModel
+
+from cache import MemoryCache, cache_folder, hash_file, remember_hash
+from generator import faces_with_aperture
+from metrics import add_bytes, span
+
+
+# maximum memory of the parsed models that are kept in memory in bytes
+MODEL_CACHE_SIZE = int(os.environ.get('MODEL_CACHE_SIZE', 512 * 1024 ** 2))
+
+# estimated memory of a parsed model for every byte of its HBJSON file
+MODEL_SIZE_FACTOR = float(os.environ.get('MODEL_SIZE_FACTOR', 6))
+
+# size of the blocks that an upload is written in
+BLOCK_SIZE = 1024 * 1024
+
+_models = MemoryCache(MODEL_CACHE_SIZE)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingest')
+_pending: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def write_upload(source: BinaryIO, file_path: Path) -> str:
+    """Write an uploaded file to disk in blocks and hash it on the way.
+
+    Returns:
+        The SHA-256 hash of the content. It is also recorded for cache.hash_file so
+        the file is not read again to hash it.
+    """
+    sha = hashlib.sha256()
+    source.seek(0)
+    with open(file_path.as_posix(), 'wb') as f:
+        for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+            sha.update(block)
+            f.write(block)
+    digest = sha.hexdigest()
+    remember_hash(file_path, digest)
+    return digest
+
+
+def write_model_data(model_data: dict, file_path: Path) -> str:
+    """Write the dictionary of a model as HBJSON in pieces and hash it on the way.
+
+    The whole JSON string of the model is never in memory at once.
+
+    Returns:
+        The SHA-256 hash of the content. It is also recorded for cache.hash_file.
+    """
+    sha = hashlib.sha256()
+    with open(file_path.as_posix(), 'wb') as f:
+        for piece in json.JSONEncoder().iterencode(model_data):
+            block = piece.encode('utf-8')
+            sha.update(block)
+            f.write(block)
+    digest = sha.hexdigest()
+    remember_hash(file_path, digest)
+    return digest
+
+
+def summarize(model: HBModel) -> dict:
+    """Get the summary statistics of a model."""
+    aperture_faces = faces_with_aperture(model)
+    return {
+        'identifier': model.identifier,
+        'display_name': model.display_name,
+        'units': model.units,
+        'rooms': len(model.rooms),
+        'faces': len(model.faces),
+        'apertures': len(model.apertures),
+        'doors': len(model.doors),
+        'shades': len(model.shades),
+        'floor_area': model.floor_area,
+        'aperture_faces': [face.identifier for face in aperture_faces],
+    }
+
+
+def _summary_file(key: str) -> Path:
+    return cache_folder('models').joinpath(f'{key}.json')
+
+
+def _ingest(hb_model_path: Path, key: str) -> dict:
+    size = hb_model_path.stat().st_size
+    model = _models.get(key)
+    if model is None:
+        with span('parse_model'), open(hb_model_path.as_posix(), 'rb') as f:
+            model = HBModel.from_dict(json.load(f))
+        add_bytes('parse_model', read=size)
+        _models.put(key, model, int(size * MODEL_SIZE_FACTOR))
+
+    # the summary and the validation report of a model that is already ingested by
+    # another session are reused
+    summary = get_summary(key)
+    if summary is not None:
+        return summary
+
+    summary_file = _summary_file(key)
+    summary = summarize(model)
+    summary['hash'] = key
+    summary['size'] = size
+    with span('validate_model'):
+        summary['report'] = model.check_all(raise_exception=False)
+
+    # write to a temporary file first so other sessions never read a partial file
+    temp_file = summary_file.with_name(f'{key}.{os.getpid()}.tmp')
+    temp_file.write_text(json.dumps(summary))
+    os.replace(temp_file.as_posix(), summary_file.as_posix())
+    return summary
+
+
+def _done(key: str, future: Future) -> None:
+    with _lock:
+        if _pending.get(key) is future:
+            del _pending[key]
+
+
+def ingest(hb_model_path: Path) -> Future:
+    """Parse and validate an HBJSON model on the background worker.
+
+    Requests for a model that is already being parsed share the same worker task.
+
+    Returns:
+        A future for the summary of the model. The summary has the statistics of
+        summarize, the hash and size of the file and the validation report, which is
+        empty for a valid model.
+    """
+    key = hash_file(hb_model_path)
+    with _lock:
+        future = _pending.get(key)
+        created = future is None
+        if created:
+            future = _executor.submit(_ingest, hb_model_path, key)
+            _pending[key] = future
+    if created:
+        future.add_done_callback(lambda f: _done(key, f))
+    return future
+
+
+def get_summary(key: str) -> Optional[dict]:
+    """Get the summary of a model from its hash. Returns None if it is not ingested."""
+    try:
+        return json.loads(_summary_file(key).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def cached_model(key: str) -> Optional[HBModel]:
+    """Get a parsed model from its hash. Returns None if it is not in memory."""
+    return _models.get(key)
+
+
+def load_model(hb_model_path: Path, key: str = None) -> HBModel:
+    """Get the parsed model of an HBJSON file and only parse it if it is not in memory.
+
+    The model is shared with other callers. Duplicate it before changing it.
+
+    Args:
+        hb_model_path: Path to the HBJSON model.
+        key: Hash of the content of the file if it is already known.
+    """
+    key = key or hash_file(hb_model_path)
+    model = _models.get(key)
+    if model is None:
+        ingest(hb_model_path).result()
+        model = _models.get(key)
+    if model is None:
+        # the model is larger than the memory cache
+        with open(hb_model_path.as_posix(), 'rb') as f:
+            model = HBModel.from_dict(json.load(f))
+    return model
@@ -0,0 +1,182 @@
+"""Timing, memory and I/O counters of the steps of a parametric study.
+
+The counters are kept for the whole process so they cover all the sessions of the
+app. They can be exported as JSON or in the OpenMetrics text format.
+"""
+
+import sys
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# number of recent spans that are kept for the diagnostics
+RECENT_SPANS = 200
+
+# prefix of the names of the exported metrics
+PREFIX = 'parametric_study'
+
+
+def peak_memory() -> int:
+    """Get the peak resident memory of the process in bytes. It is 0 if unknown."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes and Linux reports kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Metrics:
+    """Counters for the stages of a study.
+
+    Every stage has the number of calls, the total and the longest time, the errors,
+    the bytes that are read and written and how much the peak memory of the process
+    grew while it ran.
+
+    Args:
+        recent: Number of recent spans to keep.
+    """
+
+    def __init__(self, recent: int = RECENT_SPANS):
+        self.stages: Dict[str, dict] = {}
+        self.spans = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> dict:
+        return self.stages.setdefault(name, {
+            'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'errors': 0,
+            'bytes_read': 0, 'bytes_written': 0, 'memory_growth': 0,
+        })
+
+    def record(self, name: str, seconds: float, memory_growth: int = 0,
+               error: bool = False) -> None:
+        """Record a call of a stage."""
+        with self._lock:
+            stage = self._stage(name)
+            stage['count'] += 1
+            stage['seconds'] += seconds
+            stage['max_seconds'] = max(stage['max_seconds'], seconds)
+            stage['errors'] += int(error)
+            stage['memory_growth'] += memory_growth
+            self.spans.append({
+                'stage': name, 'end': time.time(), 'seconds': seconds,
+                'thread': threading.current_thread().name, 'error': error,
+            })
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time a block of code as a call of a stage."""
+        start = time.perf_counter()
+        memory = peak_memory()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, peak_memory() - memory, error)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Time the items of an iterable as one call of a stage.
+
+        Only the time to get every item is counted and not the time of the loop that
+        uses them.
+        """
+        iterator = iter(iterable)
+        seconds = 0.0
+        memory = peak_memory()
+        error = False
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - start
+                yield item
+        except GeneratorExit:
+            # the loop that uses the items has stopped early
+            raise
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, seconds, peak_memory() - memory, error)
+
+    def add_bytes(self, name: str, read: int = 0, written: int = 0) -> None:
+        """Count the bytes that a stage reads and writes."""
+        with self._lock:
+            stage = self._stage(name)
+            stage['bytes_read'] += read
+            stage['bytes_written'] += written
+
+    def reset(self) -> None:
+        """Remove all the counters."""
+        with self._lock:
+            self.stages.clear()
+            self.spans.clear()
+
+    def snapshot(self) -> dict:
+        """Get a copy of the counters, the recent spans and the peak memory."""
+        with self._lock:
+            return {
+                'stages': {name: dict(stage) for name, stage in self.stages.items()},
+                'spans': list(self.spans),
+                'peak_memory': peak_memory(),
+            }
+
+    def to_json(self) -> str:
+        """Export the counters as JSON."""
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_openmetrics(self) -> str:
+        """Export the counters in the OpenMetrics text format."""
+        snapshot = self.snapshot()
+        families = [
+            ('calls', 'counter', '', 'count', 'Number of calls of a stage.'),
+            ('duration', 'counter', 'seconds', 'seconds', 'Time spent in a stage.'),
+            ('max_duration', 'gauge', 'seconds', 'max_seconds',
+             'Longest call of a stage.'),
+            ('errors', 'counter', '', 'errors', 'Number of failed calls of a stage.'),
+            ('read', 'counter', 'bytes', 'bytes_read', 'Bytes read by a stage.'),
+            ('written', 'counter', 'bytes', 'bytes_written', 'Bytes written by a stage.'),
+            ('memory_growth', 'counter', 'bytes', 'memory_growth',
+             'Growth of the peak memory of the process during a stage.'),
+        ]
+
+        lines = []
+        for name, kind, unit, key, help_text in families:
+            family = f'{PREFIX}_stage_{name}' + (f'_{unit}' if unit else '')
+            lines.append(f'# TYPE {family} {kind}')
+            if unit:
+                lines.append(f'# UNIT {family} {unit}')
+            lines.append(f'# HELP {family} {help_text}')
+            suffix = '_total' if kind == 'counter' else ''
+            for stage, values in sorted(snapshot['stages'].items()):
+                lines.append(f'{family}{suffix}{{stage="{stage}"}} {values[key]}')
+
+        family = f'{PREFIX}_peak_memory_bytes'
+        lines.append(f'# TYPE {family} gauge')
+        lines.append(f'# UNIT {family} bytes')
+        lines.append(f'# HELP {family} Peak resident memory of the process.')
+        lines.append(f'{family} {snapshot["peak_memory"]}')
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+# the counters of this process
+METRICS = Metrics()
+span = METRICS.span
+iterate = METRICS.iterate
+add_bytes = METRICS.add_bytes
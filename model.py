@@ -7,20 +7,34 @@
 
 """
 
-import tempfile
-from pathlib import Path
-import json
 import streamlit as st
 from pollination_streamlit_io import button
-from honeybee.model import Model as HBModel
+from converter import convert
+from ingest import ingest, write_model_data, write_upload
 from viewer import render
 
 
+def model_summary(summary: dict) -> None:
+    """Render the summary statistics and the validation report of a model."""
+    columns = st.columns(4)
+    columns[0].metric('Rooms', summary['rooms'])
+    columns[1].metric('Faces', summary['faces'])
+    columns[2].metric('Apertures', summary['apertures'])
+    columns[3].metric(f"Floor area ({summary['units']})", f"{summary['floor_area']:.1f}")
+
+    if not summary['aperture_faces']:
+        st.warning(
+            'The model has no outdoor faces with apertures. The window to wall ratio '
+            'and louvers will not change it.'
+        )
+    if summary['report']:
+        with st.expander('The model has validation errors'):
+            st.text(summary['report'])
+
+
 def set_model():
     """Render the UI for uploading an input HBJSON model."""
 
-    hb_model_path = st.session_state.get('hb_model_path', None)
-
     default_index = 0
     options = ['Upload a File', 'Use Geometry Wizard']
 
@@ -33,37 +47,56 @@ def set_model():
         index=default_index
     )
 
-    if 'temp_folder' not in st.session_state:
-        st.session_state.temp_folder = Path(tempfile.mkdtemp())
-
     if option == 'Upload a File':
         uploaded_file = st.file_uploader(
             'Upload an HBJSON file.', type=['hbjson', 'json'],
             accept_multiple_files=False, key='upload_hbjson'
         )
 
-        if uploaded_file:
+        # only write the upload once and not on every rerun of the app. Every upload
+        # has a new id even if it has the same name and size as the last one.
+        upload_key = (getattr(uploaded_file, 'file_id', None) or uploaded_file.id) \
+            if uploaded_file else None
+        if uploaded_file and st.session_state.get('uploaded_model') != upload_key:
             hb_model_path = st.session_state.temp_folder.joinpath(uploaded_file.name)
-            hb_model_path.write_bytes(uploaded_file.read())
-            hb_model = HBModel.from_dict(json.loads(hb_model_path.read_text()))
+            write_upload(uploaded_file, hb_model_path)
             st.session_state.hb_model_path = hb_model_path
+            st.session_state.uploaded_model = upload_key
 
     elif option == 'Link to Model in Rhino':
         model_data = button.get(is_pollination_model=True, key='pollination-model')
 
         if model_data:
-            hb_model = HBModel.from_dict(model_data)
-            hb_model_path = st.session_state.temp_folder.joinpath(
-                f'{hb_model.identifier}.hbjson')
-            hb_model_path.write_text(json.dumps(model_data))
-            st.session_state.hb_model_path = hb_model_path
+            # comparing the dictionaries is much faster than writing the model as JSON
+            # on every rerun of the app
+            if st.session_state.get('linked_model') != model_data:
+                hb_model_path = st.session_state.temp_folder.joinpath(
+                    f'{model_data["identifier"]}.hbjson')
+                write_model_data(model_data, hb_model_path)
+                st.session_state.hb_model_path = hb_model_path
+            # keep the latest copy so the last one can be freed
+            st.session_state.linked_model = model_data
 
     elif option == 'Use Geometry Wizard':
         st.session_state.hb_model_path = None
         st.warning('The geometry wizard is not supported yet. 😔')
 
-    if 'hb_model_path' in st.session_state:
-        render(st.session_state.hb_model_path, bake=False, key='model-viewer')
+    hb_model_path = st.session_state.get('hb_model_path', None)
+    if hb_model_path:
+        # parse the model and convert it for the viewer at the same time
+        model_future = ingest(hb_model_path)
+        if st.session_state.host.lower() != 'rhino':
+            convert(hb_model_path)
+        with st.spinner('Loading the model...'):
+            try:
+                summary = model_future.result()
+            except Exception as error:
+                st.error(f'Failed to load the model: {error}')
+                del st.session_state.hb_model_path
+                return
+
+        model_summary(summary)
+        render(hb_model_path, bake=False, key='model-viewer')
         st.write(
             'The model is loaded! You can now move to the next step to set the '
             'input parameters.'
@@ -1,79 +1,72 @@
 """Module to visualize model with parameters applied."""
 
-import shutil
 import streamlit as st
-from pathlib import Path
-from honeybee.model import Model as HBModel
-from honeybee.boundarycondition import Outdoors
-from typing import List, Dict, Tuple
+from typing import Union
 from viewer import render
+from converter import prefetch
+from store import DesignOptions, OptionStore
+from combinations import CombinationSpace
+from sampling import DesignSample
+from cache import hash_file
 
 
-def generate_design_options(design_combinations,
-                            abbreviations) -> Tuple[Dict[str, Path], Dict[str, Path],
-                                                    List[dict]]:
+# maximum number of design options that are listed to select one to visualize
+MAX_LISTED = 100
 
-    design_options_folder = st.session_state.temp_folder.joinpath('design_options')
-    if design_options_folder.exists():
-        shutil.rmtree(design_options_folder)
-    design_options_folder.mkdir(exist_ok=True, parents=True)
 
-    base_model = HBModel.from_hbjson(st.session_state.hb_model_path.as_posix())
+def get_option_store() -> OptionStore:
+    """Get the design option store for the current input model."""
+    store = st.session_state.get('option_store', None)
+    if store is None or store.base_hash != hash_file(st.session_state.hb_model_path):
+        store = OptionStore(st.session_state.hb_model_path)
+        st.session_state.option_store = store
+    return store
 
-    faces_with_aperture = [face for face in base_model.faces if face.apertures and isinstance(
-        face.boundary_condition, Outdoors)]
 
-    pre_viz_dict = {}  # Used for visualization before Run
-    post_viz_dict = {}  # Used for visualization after run
-    design_options = []  # Used for submission to pollination
+def generate_design_options(
+        design_combinations: Union[CombinationSpace, DesignSample]) -> DesignOptions:
+    """Get the design options of the design combinations.
 
-    for num, design_combination in enumerate(design_combinations):
-        design_option = {}
+    The deltas are only created when they are used so a large study is not built in
+    memory on every rerun of the app.
+    """
+    return DesignOptions(get_option_store(), design_combinations)
 
-        for face in faces_with_aperture:
-            if 'Window to wall ratio' in design_combination:
-                face.apertures_by_ratio(design_combination['Window to wall ratio'])
-                design_option['Window to wall ratio'] = design_combination['Window to wall ratio']
 
-            for aperture in face.apertures:
-                if 'Louver count' in design_combination and design_combination['Louver count'] > 0 and \
-                        'Louver depth' in design_combination and design_combination['Louver depth'] > 0:
-                    louvers = aperture.louvers_by_count(
-                        design_combination['Louver count'], design_combination['Louver depth'])
-                    design_option['Louver count'] = design_combination['Louver count']
-                    design_option['Louver depth'] = design_combination['Louver depth']
+def select_option(design_options: DesignOptions) -> int:
+    """Select the position of a design option to visualize.
 
-        # create names
-        viz_name = ', '.join(
-            [f'{key}:{design_combination[key]}' for key in design_combination])
-        file_name = '__'.join(
-            [f'{abbreviations[key]}_{design_combination[key]}' for key in design_combination])
+    Small studies list every option. Larger ones select it by its position so the
+    page doesn't have a label for every option.
+    """
+    if len(design_options) <= MAX_LISTED:
+        return st.radio('Select design option to visualize',
+                        range(len(design_options)), format_func=design_options.name)
+    position = st.number_input(
+        f'Select design option to visualize (1 to {len(design_options)})',
+        min_value=1, max_value=len(design_options), value=1, step=1) - 1
+    st.write(design_options.name(position))
+    return position
 
-        hbjson_file = design_options_folder.joinpath(f'{file_name}.hbjson')
 
-        # write design option as HBJSON
-        base_model.to_hbjson(hbjson_file.as_posix())
-
-        pre_viz_dict[viz_name] = hbjson_file
-        post_viz_dict[num] = hbjson_file
-        design_option['model'] = hbjson_file.as_posix()
-        design_options.append(design_option)
-
-    return pre_viz_dict, post_viz_dict, design_options
-
-
-def get_design_options(design_combinations: List[dict],
-                       abbreviations: dict) -> Tuple[List[Dict], Dict[str, Path]]:
+def get_design_options(
+        design_combinations: Union[CombinationSpace, DesignSample]) -> DesignOptions:
     """Visualize a design option."""
 
-    pre_viz_dict, post_viz_dict, design_options = generate_design_options(
-        design_combinations, abbreviations)
+    design_options = generate_design_options(design_combinations)
+    if not len(design_options):
+        st.error('There are no design options. Go back to step 2 to change the '
+                 'parameters.')
+        return design_options
 
-    st.session_state.post_viz_dict = post_viz_dict
+    position = select_option(design_options)
 
-    viz_option = st.radio('Select design option to visualize',
-                          list(pre_viz_dict.keys()))
+    store = design_options.store
+    render(store.get(design_options[position]), key='options-viewer')
 
-    render(pre_viz_dict[viz_option], key='options-viewer')
+    # prepare the next option in the list in the background
+    if position + 1 < len(design_options):
+        next_option = design_options[position + 1]
+        prefetch(lambda: store.get(next_option))
 
-    return design_options, post_viz_dict
+    return design_options
@@ -2,8 +2,10 @@
 
 
 import streamlit as st
-import itertools
-from typing import List, Tuple
+from typing import Tuple, Union
+
+from combinations import CombinationSpace
+from sampling import SAMPLING_METHODS, DesignSample, sample
 
 
 ABBREVIATIONS = {
@@ -15,25 +17,12 @@ ABBREVIATIONS = {
 }
 
 
-@st.cache()
-def calculate_combination(input_params: dict) -> Tuple[List[dict], int]:
-
-    total_runs = 1
-    for d in input_params.values():
-        total_runs *= len(d)
-
-    keys = input_params.keys()
-    values = (input_params[key] for key in keys)
-    combination = [dict(zip(keys, combination))
-                   for combination in itertools.product(*values)]
-
-    # TODO this can be captured in a unit test
-    assert len(combination) == total_runs, 'Calulating design combinations failed.'
-
+def calculate_combination(input_params: dict) -> Tuple[CombinationSpace, int]:
+    combination = CombinationSpace(input_params)
     return combination, len(combination)
 
 
-def get_design_combinations() -> Tuple[List[dict], dict]:
+def get_design_combinations() -> Tuple[Union[CombinationSpace, DesignSample], dict]:
     # TODO: Make sure to capture this in a form so that if the user comes back to the
     # TODO: tab the params are still there.
 
@@ -114,6 +103,27 @@ def get_design_combinations() -> Tuple[List[dict], dict]:
 
     design_combinations, total_runs = calculate_combination(input_params)
 
+    if total_runs == 0:
+        st.error('There are no design combinations for these values. Change the '
+                 'ranges so every parameter has at least one value.')
+        return design_combinations, ABBREVIATIONS
+
+    st.header('Sampling')
+    method = st.selectbox('Sampling method', SAMPLING_METHODS, index=0)
+    if method != 'Full factorial':
+        budget, seed = st.columns(2)
+        run_budget = budget.number_input(
+            'Maximum number of runs', min_value=1, value=min(100, total_runs), step=1)
+        random_seed = seed.number_input('Random seed', min_value=0, value=0, step=1)
+        design_combinations = sample(
+            design_combinations, method, int(run_budget), int(random_seed))
+        total_runs = len(design_combinations)
+
+        if isinstance(design_combinations, DesignSample):
+            coverage = design_combinations.coverage()
+            st.write(', '.join(
+                f'{key}: {value:.2f}' for key, value in coverage.items()))
+
     st.subheader(f'Total number of runs: {total_runs}')
 
     return design_combinations, ABBREVIATIONS
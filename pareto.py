@@ -0,0 +1,100 @@
+"""Multi-objective ranking of the results of a parametric study."""
+
+import numpy as np
+from typing import List
+from pandas import DataFrame
+
+from table import ResultsTable
+
+
+def objectives(table: ResultsTable) -> DataFrame:
+    """Get the objectives of every run. All of them are minimized.
+
+    Glazing and louver material are relative quantities that are derived from the
+    parameters. Glazing is the window to wall ratio. Louver material is the louver
+    count times the louver depth times the width of the apertures, which scales with
+    the square root of the window to wall ratio.
+    """
+    frame = table.frame
+    wwr = frame['window-to-wall-ratio'].fillna(0) if 'window-to-wall-ratio' in frame \
+        else None
+    count = frame['louver-count'].fillna(0) if 'louver-count' in frame else 0
+    depth = frame['louver-depth'].fillna(0) if 'louver-depth' in frame else 0
+
+    result = DataFrame({'EUI': frame['eui']}, index=frame.index)
+    if wwr is not None:
+        result['Glazing'] = wwr
+    louvers = count * depth * (np.sqrt(wwr) if wwr is not None else 1)
+    if np.any(louvers):
+        result['Louver material'] = louvers
+    return result
+
+
+def pareto_front(costs: np.ndarray) -> np.ndarray:
+    """Find the rows that are not dominated by any other row.
+
+    A row dominates another one if it is not worse in any objective and better in at
+    least one. Rows that are equal to a front member are not kept.
+
+    Args:
+        costs: An array with one row per run and one column per objective to minimize.
+
+    Returns:
+        A boolean mask of the rows on the Pareto front.
+    """
+    remaining = np.arange(len(costs))
+    candidates = costs
+    position = 0
+    while position < len(candidates):
+        # keep the rows that are better than the current row in at least one objective
+        keep = np.any(candidates < candidates[position], axis=1)
+        keep[position] = True
+        remaining = remaining[keep]
+        candidates = candidates[keep]
+        position = np.sum(keep[:position]) + 1
+
+    mask = np.zeros(len(costs), dtype=bool)
+    mask[remaining] = True
+    return mask
+
+
+def pareto_ranks(costs: np.ndarray) -> np.ndarray:
+    """Get the non-dominated rank of every row. The Pareto front has rank 0."""
+    ranks = np.full(len(costs), -1, dtype=int)
+    rank = 0
+    while np.any(ranks < 0):
+        unranked = np.flatnonzero(ranks < 0)
+        front = pareto_front(costs[unranked])
+        # rows that are equal to a front member share its rank
+        members = costs[unranked][front]
+        equal = (costs[unranked][:, None, :] == members[None, :, :]).all(axis=-1).any(axis=1)
+        ranks[unranked[front | equal]] = rank
+        rank += 1
+    return ranks
+
+
+def front_options(table: ResultsTable) -> List[int]:
+    """Get the option numbers of the runs on the Pareto front.
+
+    This only finds the first front and is much faster than rank_options for large
+    studies. Runs that are equal to a front member are on the front too.
+    """
+    costs = objectives(table).to_numpy(dtype=float)
+    front = pareto_front(costs)
+    members = {tuple(row) for row in costs[front]}
+    on_front = front | np.array([tuple(row) in members for row in costs], dtype=bool)
+    return table['option-no'][on_front].tolist()
+
+
+def rank_options(table: ResultsTable) -> DataFrame:
+    """Rank the runs by Pareto rank and then by EUI.
+
+    Returns:
+        The objectives of every run with its option number and Pareto rank, sorted
+        from the best to the worst.
+    """
+    costs = objectives(table)
+    ranked = costs.copy()
+    ranked.insert(0, 'option-no', table['option-no'])
+    ranked['Pareto rank'] = pareto_ranks(costs.to_numpy(dtype=float))
+    return ranked.sort_values(['Pareto rank', 'EUI'], kind='stable')
@@ -0,0 +1,112 @@
+"""Poll the status of a Pollination job on a background thread."""
+
+import time
+import threading
+from typing import Dict, List
+
+from queenbee.job.job import JobStatusEnum
+from queenbee.job.run import RunStatusEnum
+
+
+# run statuses grouped in the counts that are published by the poller
+RUN_GROUPS = {
+    RunStatusEnum.created: 'created',
+    RunStatusEnum.scheduled: 'created',
+    RunStatusEnum.unknown: 'created',
+    RunStatusEnum.running: 'running',
+    RunStatusEnum.post_processing: 'running',
+    RunStatusEnum.succeeded: 'succeeded',
+    RunStatusEnum.failed: 'failed',
+    RunStatusEnum.cancelled: 'failed',
+}
+
+FINISHED = [JobStatusEnum.completed, JobStatusEnum.failed, JobStatusEnum.cancelled]
+
+
+class StatusPoller(threading.Thread):
+    """Track the status of a job and its runs with exponential backoff.
+
+    The interval between two polls is doubled every time nothing has changed, up to
+    max_interval, and goes back to min_interval as soon as something changes. The
+    poller stops once the job is finished.
+
+    Args:
+        job: The job to poll.
+        min_interval: Minimum number of seconds between two polls.
+        max_interval: Maximum number of seconds between two polls.
+    """
+
+    def __init__(self, job, min_interval: float = 5, max_interval: float = 120):
+        super().__init__(daemon=True)
+        self.job = job
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.job_status = JobStatusEnum.unknown
+        self.runs = []
+        self.counts = {'created': 0, 'running': 0, 'succeeded': 0, 'failed': 0}
+        self.error = None
+        self.last_poll = None
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        """A boolean to note if the job is finished."""
+        return self.job_status in FINISHED
+
+    @property
+    def succeeded(self) -> List[int]:
+        """Positions of the runs that have succeeded."""
+        with self._lock:
+            return [num for num, run in enumerate(self.runs)
+                    if run.status.status == RunStatusEnum.succeeded]
+
+    def poll(self) -> bool:
+        """Get the latest status of the job and its runs.
+
+        Returns True if anything has changed since the last poll.
+        """
+        job_status = self.job.status.status
+        runs = self.job.runs
+        counts = {group: 0 for group in self.counts}
+        for run in runs:
+            counts[RUN_GROUPS.get(run.status.status, 'created')] += 1
+
+        with self._updated:
+            changed = job_status != self.job_status or counts != self.counts
+            self.job_status = job_status
+            self.runs = runs
+            self.counts = counts
+            self.error = None
+            self.last_poll = time.time()
+            self._updated.notify_all()
+        return changed
+
+    def run(self) -> None:
+        interval = self.min_interval
+        while not self._stopped.is_set():
+            try:
+                changed = self.poll()
+            except Exception as error:
+                self.error = error
+                changed = False
+            if self.finished:
+                break
+            interval = self.min_interval if changed \
+                else min(interval * 2, self.max_interval)
+            self._stopped.wait(interval)
+
+    def wait_for_update(self, timeout: float = None) -> None:
+        """Block until the next poll finishes or the timeout is reached."""
+        with self._updated:
+            self._updated.wait(timeout)
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self._stopped.set()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get a copy of the latest run counts."""
+        with self._lock:
+            return dict(self.counts)
@@ -0,0 +1,93 @@
+"""Indexed queries over the results of a parametric study."""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from table import ResultsTable
+
+
+class ResultsIndex:
+    """Sorted column indices and a normalized parameter space over a ResultsTable.
+
+    Queries return the positions of the matching rows in the table. Runs without a
+    parameter, like options without louvers, have a value of zero for it.
+
+    Args:
+        table: The results table to index.
+    """
+
+    def __init__(self, table: ResultsTable):
+        self.table = table
+        self.columns = ['eui'] + table.parameter_columns
+
+        # a sorted copy of every column for range queries with a binary search
+        self._sorted = {}
+        for column in self.columns:
+            values = table[column]
+            if column != 'eui':
+                values = np.nan_to_num(values, nan=0.0)
+            order = np.argsort(values, kind='stable')
+            self._sorted[column] = (order, values[order])
+
+        # parameters scaled to a unit hypercube for nearest neighbour queries
+        points = table.frame[table.parameter_columns].fillna(0).to_numpy(dtype=float)
+        self._lower = points.min(axis=0) if len(points) else 0
+        spread = points.max(axis=0) - self._lower if len(points) else 1
+        self._scale = np.where(spread > 0, spread, 1.0)
+        self._points = (points - self._lower) / self._scale
+
+    def range(self, **ranges: Tuple[float, float]) -> np.ndarray:
+        """Get the rows with values inside a range for one or more columns.
+
+        Column names use underscores instead of dashes, for instance
+        index.range(eui=(0, 100), louver_count=(1, 3)).
+        """
+        matches = None
+        for name, (lower, upper) in ranges.items():
+            order, values = self._sorted[name.replace('_', '-')]
+            start = np.searchsorted(values, lower, side='left')
+            end = np.searchsorted(values, upper, side='right')
+            rows = order[start:end]
+            matches = rows if matches is None else np.intersect1d(matches, rows)
+        if matches is None:
+            return np.arange(len(self.table))
+        return np.sort(matches)
+
+    def values(self, column: str) -> np.ndarray:
+        """Get the sorted values of a column that the queries use without NaN values."""
+        values = self._sorted[column][1]
+        return values[~np.isnan(values)]
+
+    def top_k(self, k: int, column: str = 'eui') -> np.ndarray:
+        """Get the k rows with the lowest values of a column from lowest to highest."""
+        order, values = self._sorted[column]
+        # NaN values are sorted to the end
+        return order[:k][~np.isnan(values[:k])]
+
+    def nearest(self, design: Dict[str, float], k: int = 1) -> np.ndarray:
+        """Get the k rows that are the closest to a design in the parameter space.
+
+        Args:
+            design: Values of the parameters keyed by their results column.
+            k: Number of rows to return.
+        """
+        point = np.array(
+            [design.get(column, 0) for column in self.table.parameter_columns],
+            dtype=float)
+        point = (point - self._lower) / self._scale
+        distance = ((self._points - point) ** 2).sum(axis=1)
+        k = min(k, len(distance))
+        if k <= 0:
+            return np.array([], dtype=int)
+        closest = np.argpartition(distance, k - 1)[:k]
+        return closest[np.argsort(distance[closest], kind='stable')]
+
+    def rows(self, positions: np.ndarray) -> DataFrame:
+        """Get the rows of the table at some positions."""
+        return self.table.frame.iloc[positions]
+
+    def option_numbers(self, positions: np.ndarray) -> List[int]:
+        """Get the option numbers of the rows at some positions."""
+        return [int(option) for option in self.table['option-no'][positions]]
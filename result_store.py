@@ -0,0 +1,111 @@
+"""A persistent SQLite store for the results of Pollination jobs."""
+
+import sqlite3
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from pandas import DataFrame, read_json
+
+from cache import cache_folder
+
+
+class ResultStore:
+    """Store the EUI of every run and the runs dataframe of finished jobs.
+
+    Args:
+        db_file: Path to the SQLite database. Defaults to results.db in the
+            cache folder.
+    """
+
+    def __init__(self, db_file: Path = None):
+        self.db_file = db_file or cache_folder('results').joinpath('results.db')
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS runs ('
+                'job_id TEXT, run_id TEXT, position INTEGER, eui REAL, '
+                'PRIMARY KEY (job_id, run_id))'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS dataframes ('
+                'job_id TEXT PRIMARY KEY, data TEXT)'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.db_file.as_posix(), timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def eui(self, job_id: str) -> Dict[str, float]:
+        """Get the stored EUI of the runs of a job keyed by run id."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT run_id, eui FROM runs WHERE job_id = ?', (job_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def run_ids(self, job_id: str) -> List[str]:
+        """Get the ids of the stored runs of a job in the order of the runs."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT run_id FROM runs WHERE job_id = ? ORDER BY position', (job_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def add_eui(self, job_id: str, eui: Dict[str, float],
+                positions: Dict[str, int] = None) -> None:
+        """Add the EUI of runs of a job.
+
+        Args:
+            job_id: The id of the job.
+            eui: EUI values keyed by run id.
+            positions: Position of each run in the list of the runs of the job.
+        """
+        positions = positions or {}
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?)',
+                [(job_id, run_id, positions.get(run_id), value)
+                 for run_id, value in eui.items()]
+            )
+
+    def dataframe(self, job_id: str) -> Optional[DataFrame]:
+        """Get the stored runs dataframe of a job."""
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT data FROM dataframes WHERE job_id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return read_json(StringIO(row[0]), orient='split')
+
+    def set_dataframe(self, job_id: str, df: DataFrame) -> None:
+        """Store the runs dataframe of a job."""
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO dataframes VALUES (?, ?)',
+                (job_id, df.to_json(orient='split'))
+            )
+
+    def load(self, job_id: str) -> Optional[tuple]:
+        """Load the runs dataframe and the ordered EUI list of a finished job.
+
+        Returns None if the results of the job are not stored completely.
+        """
+        df = self.dataframe(job_id)
+        if df is None:
+            return None
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT eui FROM runs WHERE job_id = ? ORDER BY position',
+                (job_id,)
+            ).fetchall()
+        if len(rows) != len(df.index):
+            return None
+        eui: List[float] = [row[0] for row in rows]
+        return df, eui
@@ -1,19 +1,25 @@
 """Download the results of a parametric study."""
 
-import json
-import zipfile
-import shutil
-from pandas import DataFrame
+import numpy as np
 import streamlit as st
 
 from enum import Enum
-from typing import List
 from pathlib import Path
+from typing import List, Optional
 
 from pollination_streamlit.api.client import ApiClient
 from pollination_streamlit.interactors import Job
 from queenbee.job.job import JobStatusEnum
 
+from combinations import ARGUMENT_NAMES
+from fetch import ModelFetcher
+from poller import StatusPoller
+from result_store import ResultStore
+from store import DesignOptions
+from study import collect_eui, parse_job_url
+from table import ResultsTable
+from visualize import get_figure
+
 
 class SimStatus(Enum):
     NOTSTARTED = 0
@@ -23,111 +29,258 @@ class SimStatus(Enum):
     CANCELLED = 4
 
 
-def request_status(job: Job) -> SimStatus:
+def to_sim_status(job_status: JobStatusEnum) -> SimStatus:
+    """Convert the status of a job to a SimStatus."""
 
-    if job.status.status in [
+    if job_status in [
             JobStatusEnum.pre_processing,
             JobStatusEnum.running,
             JobStatusEnum.created,
             JobStatusEnum.unknown]:
         return SimStatus.INCOMPLETE
 
-    elif job.status.status == JobStatusEnum.failed:
+    elif job_status == JobStatusEnum.failed:
         return SimStatus.FAILED
 
-    elif job.status.status == JobStatusEnum.cancelled:
+    elif job_status == JobStatusEnum.cancelled:
         return SimStatus.CANCELLED
 
     else:
         return SimStatus.COMPLETE
 
 
-def extract_eui(file_path: Path) -> float:
-    """Extract EUI data from the eui.JSON file."""
-    with open(file_path.as_posix(), 'r') as file:
-        data = json.load(file)
-        return data['eui']
+def request_status(job: Job) -> SimStatus:
+    return to_sim_status(job.status.status)
 
 
-def get_eui(job) -> List[float]:
-    """Get a list of EUI data for each run of the job."""
+def get_poller(job: Job) -> StatusPoller:
+    """Get the background status poller of a job and start it if needed."""
+    poller = st.session_state.get('status_poller', None)
+    if poller is None or poller.job.id != job.id:
+        if poller is not None:
+            poller.stop()
+        poller = StatusPoller(job)
+        poller.start()
+        st.session_state.status_poller = poller
+    if poller.last_poll is None and poller.error is None:
+        # wait for the first poll so the tab doesn't show an unknown status
+        poller.wait_for_update(timeout=10)
+    return poller
 
-    eui_folder = st.session_state.temp_folder.joinpath('eui')
-    st.session_state.eui_folder = eui_folder
-    if not eui_folder.exists():
-        eui_folder.mkdir(parents=True, exist_ok=True)
-    else:
-        shutil.rmtree(eui_folder)
-        eui_folder.mkdir(parents=True, exist_ok=True)
 
-    runs = job.runs
-    eui = []
+def get_result_store() -> ResultStore:
+    """Get the persistent store for the results of the jobs."""
+    if 'result_store' not in st.session_state:
+        st.session_state.result_store = ResultStore()
+    return st.session_state.result_store
 
-    for run in runs:
-        res_zip = run.download_zipped_output('eui')
-        run_folder = eui_folder.joinpath(run.id)
-        if not run_folder.exists():
-            run_folder.mkdir(parents=True, exist_ok=True)
 
-        with zipfile.ZipFile(res_zip) as zip_folder:
-            zip_folder.extractall(run_folder.as_posix())
+def ingest_eui(job, runs: list, selection: List[int]) -> List[float]:
+    """Get the EUI of the selected runs of the job.
 
-        eui_file = run_folder.joinpath('eui.json')
-        eui.append(extract_eui(eui_file))
+    Only the runs that are not in the result store are downloaded.
 
-    return eui
+    Args:
+        job: The job of the runs.
+        runs: All the runs of the job.
+        selection: Positions of the runs to get the EUI for.
+    """
+    return collect_eui(get_result_store(), job, runs, selection)
 
 
-def create_job(job_url: str) -> Job:
-    """Create a Job object from a job URL."""
-    url_split = job_url.split('/')
-    job_id = url_split[-1]
-    project = url_split[-3]
-    owner = url_split[-5]
+def get_eui(job) -> List[float]:
+    """Get a list of EUI data for each run of the job."""
+    runs = job.runs
+    return ingest_eui(job, runs, list(range(len(runs))))
 
-    st.session_state.job = Job(owner, project, job_id, ApiClient(
-        api_token=st.session_state.api_key))
 
+def get_partial_results(job, poller: StatusPoller) -> ResultsTable:
+    """Get the results of the runs that have succeeded so far."""
+    runs, succeeded = poller.runs, poller.succeeded
+    eui = ingest_eui(job, runs, succeeded)
+    df = job.runs_dataframe.dataframe.iloc[succeeded]
+    return ResultsTable.from_results(df, eui, [runs[num].id for num in succeeded])
 
-def download_models(job: Job) -> None:
-    """Download HBJSON models from the job."""
 
-    model_folder = st.session_state.temp_folder.joinpath('model')
-    if not model_folder.exists():
-        model_folder.mkdir(parents=True, exist_ok=True)
-    else:
-        shutil.rmtree(model_folder.as_posix())
-        model_folder.mkdir(parents=True, exist_ok=True)
+def ingest_while_running(job, poller: StatusPoller) -> SimStatus:
+    """Download the EUI of every run as soon as it succeeds until the job is done.
+
+    The number of downloaded runs and the plot are updated after every poll.
+    """
+    message = st.empty()
+    chart = st.empty()
 
-    artifacts = job.list_artifacts('inputs/model')
-    for artifact in artifacts:
-        hbjson_artifact = artifact.list_children()[0]
-        hbjson_file = model_folder.joinpath(hbjson_artifact.name)
-        hbjson_data = hbjson_artifact.download()
-        hbjson_file.write_bytes(hbjson_data.read())
+    while True:
+        table = get_partial_results(job, poller)
+        message.write(f'Downloaded results for {len(table)} of {len(poller.runs)} runs.')
+        if len(table):
+            chart.plotly_chart(get_figure(table))
+        if poller.finished:
+            return to_sim_status(poller.job_status)
+        poller.wait_for_update(timeout=poller.max_interval)
 
-    st.session_state.model_folder = model_folder
 
+def create_job(job_url: str) -> Job:
+    """Create a Job object from a job URL."""
+    owner, project, job_id = parse_job_url(job_url)
 
-def results(job_url):
+    job = st.session_state.get('job', None)
+    if job is not None and job.id == job_id:
+        return
+
+    st.session_state.job = Job(owner, project, job_id, ApiClient(
+        api_token=st.session_state.api_key))
 
-    df = DataFrame()
-    eui = []
+
+def get_model_fetcher(job: Job) -> ModelFetcher:
+    """Get the fetcher of the input models of the job.
+
+    The models are only downloaded when they are visualized. The HBJSON of a design
+    option of this session is used instead if it has the same content.
+    """
+    fetcher = st.session_state.get('model_fetcher', None)
+    if fetcher is not None and fetcher.job.id == job.id:
+        return fetcher
+    if fetcher is not None:
+        fetcher.close()
+
+    # the fetcher runs on other threads so it can't use the session state
+    design_options = st.session_state.get('design_options', None)
+
+    def local_model(option_no: int, name: str) -> Optional[Path]:
+        if design_options is None:
+            return None
+        delta = design_options.option(option_no)
+        # design options are named after their content
+        if delta is None or design_options.store.path(delta).name != name:
+            return None
+        return design_options.store.get(delta)
+
+    fetcher = ModelFetcher(
+        job, st.session_state.temp_folder.joinpath('model'), local=local_model)
+    st.session_state.model_fetcher = fetcher
+    return fetcher
+
+
+def batch_results(job_urls: List[str]) -> Optional[ResultsTable]:
+    """Get the results of the finished batch jobs of an adaptive study as one table.
+
+    The option numbers of every batch are indices in the full space so the models of
+    the runs are written again from the design options of this session.
+    """
+    store = get_result_store()
+    tables = []
+    for job_url in job_urls:
+        owner, project, job_id = parse_job_url(job_url)
+        stored = store.load(job_id)
+        if not stored and st.session_state.get('api_key'):
+            job = Job(owner, project, job_id, ApiClient(
+                api_token=st.session_state.api_key))
+            if request_status(job) == SimStatus.COMPLETE:
+                get_eui(job)
+                store.set_dataframe(job.id, job.runs_dataframe.dataframe)
+                stored = store.load(job_id)
+        if stored:
+            df, eui = stored
+            tables.append(ResultsTable.from_results(df, eui, store.run_ids(job_id)))
+
+    st.write(f'{len(tables)} of {len(job_urls)} batches are finished.')
+    fetcher = st.session_state.pop('model_fetcher', None)
+    if fetcher is not None:
+        fetcher.close()
+    if not tables:
+        st.button('Refresh to download results')
+        return None
+    st.success('Result downloaded. Move to the next tab.')
+    return ResultsTable.concat(tables)
+
+
+def load_results() -> Optional[ResultsTable]:
+    """Load the results of a study from a Parquet file.
+
+    The runs of the file don't belong to the job of this session so the fetcher of
+    the models of the job is closed.
+    """
+    uploaded = st.file_uploader('Load results from a Parquet file', type=['parquet'])
+    if not uploaded:
+        return None
+    fetcher = st.session_state.pop('model_fetcher', None)
+    if fetcher is not None:
+        fetcher.close()
+    return ResultsTable.from_parquet(uploaded.read())
+
+
+def matching_options(design_options: Optional[DesignOptions],
+                     table: ResultsTable) -> Optional[DesignOptions]:
+    """Get the design options of this session if they match the runs of a table.
+
+    Returns None if the parameters of any run are not the ones of its option number
+    so the models of an imported study are never written from other options.
+    """
+    if design_options is None:
+        return None
+    numbers = np.unique(table['option-no'])
+    combinations = [design_options.combination(int(number)) for number in numbers]
+    if any(combination is None for combination in combinations):
+        return None
+    positions = np.searchsorted(numbers, table['option-no'])
+    # all the combinations of a space have the same parameters
+    for key in (combinations[0] if combinations else {}):
+        column = ARGUMENT_NAMES.get(key, key)
+        if column not in table:
+            return None
+        expected = np.array([combination[key] for combination in combinations],
+                            dtype=float)
+        if not np.allclose(table[column], expected[positions]):
+            return None
+    return design_options
+
+
+def results(job_url) -> Optional[ResultsTable]:
+
+    # the results of an adaptive study are merged from all of its batches
+    study = st.session_state.get('adaptive_study', None)
+    if study is not None and job_url in study.jobs:
+        return batch_results(study.jobs)
+
+    # load the results from the result store if they are already downloaded
+    store = get_result_store()
+    job_id = job_url.split('/')[-1]
+    stored = store.load(job_id)
+    if stored:
+        df, eui = stored
+        if st.session_state.get('api_key'):
+            create_job(job_url)
+            get_model_fetcher(st.session_state.job)
+        st.success('Result downloaded. Move to the next tab.')
+        return ResultsTable.from_results(df, eui, store.run_ids(job_id))
 
     create_job(job_url)
 
     job = st.session_state.job
 
-    if request_status(job) != SimStatus.COMPLETE:
+    # the status is polled on a background thread and cached in the session
+    poller = get_poller(job)
+    status = to_sim_status(poller.job_status)
+    counts = poller.snapshot()
+    if poller.error is not None:
+        st.warning(f'Failed to get the status of the job: {poller.error}')
+    st.write(', '.join(f'{count} {group}' for group, count in counts.items()))
+
+    if status == SimStatus.INCOMPLETE and \
+            st.checkbox('Download results as runs finish', key='ingest-results'):
+        status = ingest_while_running(job, poller)
+
+    if status != SimStatus.COMPLETE:
         clicked = st.button('Refresh to download results')
         if clicked:
-            status = request_status(job)
             st.warning(f'Simulation is {status.name}.')
+        return None
 
-    else:
-        eui = get_eui(job)
-        download_models(job)
-        df = job.runs_dataframe.dataframe
-        st.success('Result downloaded. Move to the next tab.')
+    eui = get_eui(job)
+    get_model_fetcher(job)
+    df = job.runs_dataframe.dataframe
+    store.set_dataframe(job.id, df)
+    st.success('Result downloaded. Move to the next tab.')
 
-    return df, eui
+    return ResultsTable.from_results(df, eui, store.run_ids(job.id))
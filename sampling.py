@@ -0,0 +1,160 @@
+"""Design of experiments sampling of a space of design combinations."""
+
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+
+from combinations import CombinationSpace
+
+
+SAMPLING_METHODS = ['Full factorial', 'Latin hypercube', 'Halton', 'Random subset']
+
+_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47]
+
+
+class DesignSample:
+    """A subset of the combinations of a CombinationSpace.
+
+    Args:
+        space: The full space of design combinations.
+        indices: Indices of the sampled combinations in the space.
+    """
+
+    def __init__(self, space: CombinationSpace, indices: List[int]):
+        self.space = space
+        self.indices = list(indices)
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(index, slice):
+            return [self.space[i] for i in self.indices[index]]
+        return self.space[self.indices[index]]
+
+    def __iter__(self) -> Iterator[dict]:
+        for index in self.indices:
+            yield self.space[index]
+
+    def __repr__(self) -> str:
+        return f'DesignSample: {len(self)} of {len(self.space)} combinations'
+
+    def chunks(self, size: int) -> Iterator[List[dict]]:
+        """Iterate over the combinations in lists of a given size."""
+        for start in range(0, len(self.indices), size):
+            yield self[start:start + size]
+
+    def levels(self) -> np.ndarray:
+        """Get the index of the value of every parameter for every combination.
+
+        Returns:
+            An array with one row per combination and one column per parameter.
+        """
+        sizes = [len(values) for values in self.space.parameters.values()]
+        levels = np.zeros((len(self.indices), len(sizes)), dtype=int)
+        remainder = np.array(self.indices, dtype=np.int64)
+        for position in reversed(range(len(sizes))):
+            remainder, levels[:, position] = np.divmod(remainder, sizes[position])
+        return levels
+
+    def coverage(self) -> Dict[str, float]:
+        """Get the coverage statistics of the sample.
+
+        Returns:
+            A dictionary with the fraction of the full space that is sampled, the
+            fraction of the values of each parameter that appear in the sample and the
+            smallest distance between two combinations in the normalized space.
+        """
+        stats = {'Sampled fraction': len(self) / len(self.space)}
+        levels = self.levels()
+        for position, (key, values) in enumerate(self.space.parameters.items()):
+            stats[f'{key} coverage'] = \
+                len(np.unique(levels[:, position])) / len(values)
+
+        if len(self) > 1:
+            points = _normalize(levels, self.space)
+            # one row at a time to keep the memory linear in the sample size
+            distance = min(
+                ((points[num + 1:] - points[num]) ** 2).sum(axis=1).min()
+                for num in range(len(points) - 1)
+            )
+            stats['Minimum distance'] = float(np.sqrt(distance))
+        return stats
+
+
+def _normalize(levels: np.ndarray, space: CombinationSpace) -> np.ndarray:
+    """Scale the value indices of combinations to a unit hypercube."""
+    sizes = np.array([len(values) for values in space.parameters.values()])
+    return levels / np.maximum(sizes - 1, 1)
+
+
+def _to_indices(points: np.ndarray, space: CombinationSpace) -> List[int]:
+    """Convert points in a unit hypercube to unique combination indices."""
+    sizes = [len(values) for values in space.parameters.values()]
+    indices = []
+    seen = set()
+    for point in points:
+        index = 0
+        for value, size in zip(point, sizes):
+            index = index * size + min(int(value * size), size - 1)
+        if index not in seen:
+            seen.add(index)
+            indices.append(index)
+    return indices
+
+
+def latin_hypercube(dimensions: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Get a Latin hypercube sample in a unit hypercube."""
+    strata = np.array([rng.permutation(count) for _ in range(dimensions)]).T
+    return (strata + rng.random((count, dimensions))) / count
+
+
+def halton(dimensions: int, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Get a randomly shifted Halton sequence in a unit hypercube."""
+    if dimensions > len(_PRIMES):
+        raise ValueError(f'Halton sampling supports up to {len(_PRIMES)} parameters.')
+    points = np.zeros((count, dimensions))
+    for dimension, base in enumerate(_PRIMES[:dimensions]):
+        for num in range(count):
+            value, fraction, index = 0.0, 1.0 / base, num + 1
+            while index > 0:
+                index, digit = divmod(index, base)
+                value += digit * fraction
+                fraction /= base
+            points[num, dimension] = value
+    return (points + rng.random(dimensions)) % 1.0
+
+
+def sample(space: CombinationSpace, method: str, budget: int,
+           seed: int = 0) -> Union[CombinationSpace, DesignSample]:
+    """Sample a space of design combinations.
+
+    Args:
+        space: The full space of design combinations.
+        method: One of the SAMPLING_METHODS.
+        budget: Maximum number of combinations in the sample.
+        seed: Seed of the random number generator so the sample can be reproduced.
+
+    Returns:
+        The full space for the full factorial method or if the budget is large enough
+        to cover it. Otherwise a DesignSample of up to budget combinations.
+    """
+    total = len(space)
+    if method == 'Full factorial' or budget >= total:
+        return space
+
+    rng = np.random.default_rng(seed)
+    if method == 'Random subset':
+        indices = sorted(rng.choice(total, size=budget, replace=False).tolist())
+        return DesignSample(space, indices)
+
+    dimensions = len(space.parameters)
+    if method == 'Latin hypercube':
+        points = latin_hypercube(dimensions, budget, rng)
+    elif method == 'Halton':
+        points = halton(dimensions, budget, rng)
+    else:
+        raise ValueError(f'Unsupported sampling method: {method}')
+
+    # several points can fall on the same combination of discrete values
+    return DesignSample(space, _to_indices(points, space))
@@ -0,0 +1,262 @@
+"""Store design options as one base model and a small delta for each option.
+
+A delta is the set of parameters that change the base model for a design option. The
+full HBJSON of an option is only written when it is needed, for instance to render it
+in the viewer or to upload it to Pollination.
+"""
+
+import os
+import json
+import shutil
+from pathlib import Path
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from cache import Pins, cache_folder, evict, hash_data, hash_file, remember_hash, touch
+from generator import build_options
+from ingest import get_summary, load_model, summarize
+from metrics import add_bytes, iterate
+
+
+# maximum size of the materialized design options in bytes
+OPTIONS_CACHE_SIZE = int(os.environ.get('OPTIONS_CACHE_SIZE', 2 * 1024 ** 3))
+
+# number of design options that are created and written at a time
+CHUNK_SIZE = 1000
+
+
+def _normalize(delta: dict) -> dict:
+    """Normalize a delta so equal values give the same cache key."""
+    return {
+        key: round(value, 6) if isinstance(value, float) else value
+        for key, value in delta.items()
+    }
+
+
+class OptionStore:
+    """Design options of a base model.
+
+    Args:
+        base_model_path: Path to the base HBJSON model.
+    """
+
+    def __init__(self, base_model_path: Path):
+        self.base_hash = hash_file(base_model_path)
+        self.folder = cache_folder('design_options').joinpath(self.base_hash)
+        self.options_folder = self.folder.joinpath('options')
+        self.options_folder.mkdir(parents=True, exist_ok=True)
+
+        self.source_path = base_model_path
+        self.base_model_path = self.folder.joinpath('base.hbjson')
+        self._copy_base()
+
+        self._face_ids = None
+
+    def _copy_base(self) -> None:
+        """Copy the base model to the store if it is not there and mark it as used.
+
+        The design options of a base model that are not used for a while are removed
+        by the workspace clean up so the base model is copied again if needed.
+        """
+        if self.base_model_path.is_file():
+            touch(self.base_model_path)
+            return
+        self.options_folder.mkdir(parents=True, exist_ok=True)
+        temp_file = self.folder.joinpath(f'base.{os.getpid()}.tmp')
+        shutil.copyfile(self.source_path.as_posix(), temp_file.as_posix())
+        os.replace(temp_file.as_posix(), self.base_model_path.as_posix())
+        # the copy has the same content so there is no need to hash it again
+        remember_hash(self.base_model_path, self.base_hash)
+
+    @property
+    def face_ids(self) -> List[str]:
+        """Identifiers of the outdoor faces with apertures that parameters apply to."""
+        if self._face_ids is None:
+            faces_file = self.folder.joinpath('faces.json')
+            try:
+                self._face_ids = json.loads(faces_file.read_text())
+            except (FileNotFoundError, ValueError):
+                summary = get_summary(self.base_hash) or summarize(self.base_model)
+                self._face_ids = summary['aperture_faces']
+                temp_file = self.folder.joinpath(f'faces.{os.getpid()}.tmp')
+                temp_file.write_text(json.dumps(self._face_ids))
+                os.replace(temp_file.as_posix(), faces_file.as_posix())
+        return self._face_ids
+
+    @property
+    def base_model(self):
+        """The parsed base model. It is shared so duplicate it before changing it."""
+        return load_model(self.base_model_path, self.base_hash)
+
+    def delta(self, design_combination: dict) -> dict:
+        """Get the parameters of a design combination that change the base model."""
+        delta = {}
+        if not self.face_ids:
+            return delta
+
+        if 'Window to wall ratio' in design_combination:
+            delta['Window to wall ratio'] = design_combination['Window to wall ratio']
+            if design_combination['Window to wall ratio'] <= 0:
+                return delta
+
+        if 'Louver count' in design_combination and design_combination['Louver count'] > 0 and \
+                'Louver depth' in design_combination and design_combination['Louver depth'] > 0:
+            delta['Louver count'] = design_combination['Louver count']
+            delta['Louver depth'] = design_combination['Louver depth']
+
+        return delta
+
+    def path(self, delta: dict) -> Path:
+        """Get the path to the HBJSON of a design option.
+
+        The file might not exist yet. Use materialize or get to write it.
+        """
+        key = hash_data({'model': self.base_hash, 'delta': _normalize(delta)})
+        return self.options_folder.joinpath(f'{key}.hbjson')
+
+    def materialize(self, deltas: List[dict], workers: int = None,
+                    pins: Pins = None) -> Iterator[Tuple[int, Path]]:
+        """Write the HBJSON of design options that are not already written.
+
+        The cache is evicted before the missing options are written and never removes
+        the options of this call.
+
+        Args:
+            deltas: A list of design option deltas.
+            workers: Number of worker processes to build the missing options.
+            pins: Pins to add the written files to so they are not evicted until the
+                pins are released, for instance after they are uploaded.
+
+        Yields:
+            A tuple of (index, hbjson_file) for every delta as soon as it is written.
+        """
+        local_pins = Pins()
+        try:
+            missing: Dict[Path, List[int]] = {}
+            for index, delta in enumerate(deltas):
+                hbjson_file = self.path(delta)
+                if hbjson_file.is_file():
+                    touch(hbjson_file)
+                    local_pins.add(hbjson_file)
+                    if pins is not None:
+                        pins.add(hbjson_file)
+                    yield index, hbjson_file
+                else:
+                    missing.setdefault(hbjson_file, []).append(index)
+
+            if not missing:
+                return
+
+            evict(cache_folder('design_options'), OPTIONS_CACHE_SIZE,
+                  'options/*.hbjson')
+            self._copy_base()
+            tasks = [(deltas[indices[0]], hbjson_file)
+                     for hbjson_file, indices in missing.items()]
+            # a single option is built in this process from the parsed base model
+            base_model = self.base_model if workers == 1 or len(tasks) == 1 else None
+            for _, _, hbjson_file in iterate('build_options', build_options(
+                    self.base_model_path, tasks, workers, base_model)):
+                add_bytes('build_options', written=hbjson_file.stat().st_size)
+                if pins is not None:
+                    pins.add(hbjson_file)
+                for index in missing[hbjson_file]:
+                    yield index, hbjson_file
+        finally:
+            local_pins.release()
+
+    def get(self, delta: dict) -> Path:
+        """Get the path to the HBJSON of a design option and write it if needed."""
+        for _, hbjson_file in self.materialize([delta], workers=1):
+            return hbjson_file
+
+
+class DesignOptions(Sequence):
+    """The design options of a collection of design combinations.
+
+    The deltas are only created when they are accessed so the options of a large
+    study are never all in memory at once.
+
+    Args:
+        store: The option store of the input model.
+        combinations: A CombinationSpace or a DesignSample.
+    """
+
+    def __init__(self, store: OptionStore, combinations):
+        self.store = store
+        self.combinations = combinations
+
+    def __len__(self) -> int:
+        return len(self.combinations)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(index, slice):
+            return [self.store.delta(combination)
+                    for combination in self.combinations[index]]
+        return self.store.delta(self.combinations[index])
+
+    def __iter__(self) -> Iterator[dict]:
+        for chunk in self.chunks(CHUNK_SIZE):
+            yield from chunk
+
+    @property
+    def option_numbers(self) -> Sequence:
+        """The option number of every design option in the job arguments.
+
+        It is the index of the combination in the full space so a sample and the
+        batches of an adaptive study use the same option numbers.
+        """
+        return getattr(self.combinations, 'indices', range(len(self)))
+
+    def combination(self, option_no: int) -> Optional[dict]:
+        """Get the combination of an option number. Returns None if it is not in the
+        space."""
+        space = getattr(self.combinations, 'space', self.combinations)
+        if not 0 <= option_no < len(space):
+            return None
+        return space[option_no]
+
+    def option(self, option_no: int) -> Optional[dict]:
+        """Get the delta of an option number. Returns None if it is not in the space."""
+        combination = self.combination(option_no)
+        if combination is None:
+            return None
+        return self.store.delta(combination)
+
+    def name(self, index: int) -> str:
+        """Get a name for a design option from the values of its parameters."""
+        combination = self.combinations[index]
+        return ', '.join(f'{key}:{value}' for key, value in combination.items())
+
+    def chunks(self, size: int) -> Iterator[List[dict]]:
+        """Iterate over the deltas in lists of a given size."""
+        for chunk in self.combinations.chunks(size):
+            yield [self.store.delta(combination) for combination in chunk]
+
+    def write(self, workers: int = None, chunk_size: int = CHUNK_SIZE,
+              pins: Pins = None) -> Iterator[Tuple[int, Path]]:
+        """Write the HBJSON of every design option a chunk at a time.
+
+        The options of the earlier chunks are not evicted while the next ones are
+        written.
+
+        Args:
+            workers: Number of worker processes to build the missing options.
+            chunk_size: Number of design options in each chunk.
+            pins: Pins to add the written files to so they are not evicted until the
+                pins are released, for instance after they are uploaded.
+
+        Yields:
+            A tuple of (index, hbjson_file) for every design option as soon as it is
+            written.
+        """
+        local_pins = Pins() if pins is None else pins
+        try:
+            start = 0
+            for chunk in self.chunks(chunk_size):
+                for num, hbjson_file in self.store.materialize(
+                        chunk, workers, local_pins):
+                    yield start + num, hbjson_file
+                start += len(chunk)
+        finally:
+            if pins is None:
+                local_pins.release()
@@ -0,0 +1,375 @@
+"""Run a parametric study without the app.
+
+This module uses the same steps as the app to generate the design options, submit
+them to Pollination, track the job and collect the results. It doesn't import
+Streamlit, Plotly or VTK so it can be used from scripts and build servers. The jobs
+use the interactors of pollination-streamlit, which only import Streamlit before
+version 0.8.0.
+
+    python study.py model.hbjson params.json weather.epw weather.ddy \
+        --owner ladybug-tools --project demo --output results.parquet
+
+The parameter file is a JSON file with the values of each parameter and optional
+sampling settings.
+
+    {
+        "parameters": {
+            "Window to wall ratio": {"min": 0.4, "max": 0.8, "step": 0.1},
+            "Louver count": [0, 2, 4],
+            "Louver depth": [0.5, 1.0]
+        },
+        "sampling": {"method": "Latin hypercube", "budget": 20, "seed": 0}
+    }
+"""
+
+import os
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+from pollination_streamlit.api.client import ApiClient
+from pollination_streamlit.interactors import Job, NewJob, Recipe
+from queenbee.job.job import JobStatusEnum
+
+from adaptive import CRITERIA, AdaptiveStudy
+from cache import Pins
+from combinations import ARGUMENT_NAMES, CombinationSpace
+from fetch import fetch_eui
+from metrics import METRICS
+from poller import StatusPoller
+from result_store import ResultStore
+from sampling import SAMPLING_METHODS, DesignSample, sample
+from store import DesignOptions, OptionStore
+from table import ResultsTable
+from upload import upload_files
+
+
+def get_annual_energy_recipe(api_client: ApiClient) -> Recipe:
+    return Recipe('ladybug-tools', 'annual-energy-use', 'latest', api_client)
+
+
+def get_job_url(job: Job) -> str:
+    return f'https://app.pollination.cloud/{job.owner}/projects/{job.project}/jobs/{job.id}'
+
+
+def parse_job_url(job_url: str) -> Tuple[str, str, str]:
+    """Get the owner, the project and the id of a job from its URL."""
+    url_split = job_url.split('/')
+    return url_split[-5], url_split[-3], url_split[-1]
+
+
+def _parameter_values(values: Union[list, dict]) -> list:
+    if isinstance(values, list):
+        return values
+    count = int(round((values['max'] - values['min']) / values['step'])) + 1
+    return [round(values['min'] + values['step'] * i, 6) for i in range(count)]
+
+
+def load_combinations(params_file: Path) -> Union[CombinationSpace, DesignSample]:
+    """Load the design combinations of a study from a parameter file.
+
+    Every parameter is a list of values or a dictionary with a min, a max and a step.
+    """
+    spec = json.loads(Path(params_file).read_text())
+    unknown = set(spec['parameters']) - set(ARGUMENT_NAMES)
+    if unknown:
+        raise ValueError(f'Unsupported parameters: {", ".join(sorted(unknown))}.')
+    space = CombinationSpace({
+        parameter: _parameter_values(values)
+        for parameter, values in spec['parameters'].items()
+    })
+
+    sampling = spec.get('sampling', {})
+    method = sampling.get('method', SAMPLING_METHODS[0])
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f'Unsupported sampling method: {method}.')
+    return sample(space, method, sampling.get('budget', len(space)),
+                  sampling.get('seed', 0))
+
+
+def generate_options(store: OptionStore, design_combinations: Union[CombinationSpace,
+                                                                    DesignSample],
+                     workers: int = None,
+                     callback: Callable[[int, int], None] = None,
+                     pins: Pins = None) -> Tuple[DesignOptions, List[Path]]:
+    """Write the HBJSON of every design option of a study.
+
+    Options are created and written a chunk at a time and the ones that are already
+    in the store are not built again.
+
+    Args:
+        store: The option store of the input model.
+        design_combinations: The design combinations of the study.
+        workers: Number of worker processes to build the options.
+        callback: A function that is called after every option with the number of
+            written options and the total number of options.
+        pins: Pins to keep the HBJSON files from being evicted until they are
+            uploaded.
+
+    Returns:
+        A tuple of the design options and the paths to their HBJSON files.
+    """
+    design_options = DesignOptions(store, design_combinations)
+    model_files = [None] * len(design_options)
+    for count, (num, hbjson_file) in enumerate(
+            design_options.write(workers, pins=pins), start=1):
+        model_files[num] = hbjson_file
+        if callback:
+            callback(count, len(design_options))
+    return design_options, model_files
+
+
+def job_arguments(design_options: Sequence[dict], model_paths: List[str], epw_path: str,
+                  ddy_path: str, option_numbers: Sequence[int] = None) -> List[dict]:
+    """Get the recipe arguments of every run of a study.
+
+    Args:
+        design_options: The design option deltas.
+        model_paths: The uploaded HBJSON of every design option.
+        epw_path: The uploaded EPW file.
+        ddy_path: The uploaded DDY file.
+        option_numbers: The option number of every design option. Defaults to their
+            position in the list.
+    """
+    arguments = []
+    for num, design_option in enumerate(design_options):
+        argument = {}
+        argument['model'] = model_paths[num]
+        argument['epw'] = epw_path
+        argument['ddy'] = ddy_path
+        argument['viz-variables'] = '-v "Zone Mean Radiant Temperature"'
+        argument['option-no'] = option_numbers[num] if option_numbers else num
+        for parameter, argument_name in ARGUMENT_NAMES.items():
+            if parameter in design_option:
+                argument[argument_name] = design_option[parameter]
+        arguments.append(argument)
+    return arguments
+
+
+def create_job(api_client: ApiClient, owner: str, project: str,
+               design_options: Sequence[dict], model_files: List[Path], epw_file: Path,
+               ddy_file: Path, option_numbers: Sequence[int] = None,
+               uploaded: Dict[str, str] = None,
+               callback: Callable[[int, int, int, float], None] = None) -> NewJob:
+    """Upload the files of a study and create a new job for it.
+
+    Args:
+        api_client: A Pollination API client.
+        owner: The account to run the job in.
+        project: The project to run the job in.
+        design_options: The design option deltas.
+        model_files: The HBJSON of every design option.
+        epw_file: Path to the EPW file.
+        ddy_file: Path to the DDY file.
+        option_numbers: The option number of every design option.
+        uploaded: Files that are already uploaded. See upload.upload_files.
+        callback: A function that is called after every upload. See
+            upload.upload_files.
+    """
+    recipe = get_annual_energy_recipe(api_client)
+    new_job = NewJob(owner, project, recipe, client=api_client)
+
+    artifact_paths = upload_files(
+        new_job, [epw_file, ddy_file] + model_files, uploaded=uploaded,
+        callback=callback
+    )
+    epw_path, ddy_path = artifact_paths[:2]
+    new_job.arguments = job_arguments(
+        design_options, artifact_paths[2:], epw_path, ddy_path, option_numbers)
+    return new_job
+
+
+def collect_eui(store: ResultStore, job, runs: list,
+                selection: List[int]) -> List[float]:
+    """Get the EUI of the selected runs of a job.
+
+    Only the runs that are not in the result store are downloaded.
+
+    Args:
+        store: The result store.
+        job: The job of the runs.
+        runs: All the runs of the job.
+        selection: Positions of the runs to get the EUI for.
+    """
+    stored = store.eui(job.id)
+
+    positions = {run.id: num for num, run in enumerate(runs)}
+    missing = [runs[num] for num in selection if runs[num].id not in stored]
+    if missing:
+        downloaded = dict(zip([run.id for run in missing], fetch_eui(missing)))
+        store.add_eui(job.id, downloaded, positions)
+        stored.update(downloaded)
+
+    return [stored[runs[num].id] for num in selection]
+
+
+def wait_for_job(job: Job, store: ResultStore = None,
+                 callback: Callable[[Dict[str, int]], None] = None,
+                 min_interval: float = 5, max_interval: float = 120) -> JobStatusEnum:
+    """Wait for a job to finish.
+
+    Args:
+        job: The job to wait for.
+        store: A result store to download the EUI of the runs to as soon as they
+            succeed. The runs are not downloaded if it is not provided.
+        callback: A function that is called after every poll with the run counts.
+        min_interval: Minimum number of seconds between two polls.
+        max_interval: Maximum number of seconds between two polls.
+
+    Returns:
+        The final status of the job.
+    """
+    poller = StatusPoller(job, min_interval, max_interval)
+    poller.start()
+    try:
+        while True:
+            if not poller.finished:
+                poller.wait_for_update(timeout=max_interval)
+            if poller.error is not None and poller.last_poll is None:
+                raise poller.error
+            if store is not None:
+                collect_eui(store, job, poller.runs, poller.succeeded)
+            if callback:
+                callback(poller.snapshot())
+            if poller.finished:
+                return poller.job_status
+    finally:
+        poller.stop()
+
+
+def collect_results(job: Job, store: ResultStore) -> ResultsTable:
+    """Download the results of a finished job that are not in the result store."""
+    runs = job.runs
+    eui = collect_eui(store, job, runs, list(range(len(runs))))
+    df = job.runs_dataframe.dataframe
+    store.set_dataframe(job.id, df)
+    return ResultsTable.from_results(df, eui, [run.id for run in runs])
+
+
+def run_study(model_file: Path, params_file: Path, epw_file: Path, ddy_file: Path,
+              owner: str, project: str, api_client: ApiClient, workers: int = None,
+              store: ResultStore = None, log: Callable[[str], None] = print
+              ) -> ResultsTable:
+    """Run every design option of a study in one job and get the results."""
+    design_combinations = load_combinations(params_file)
+    option_store = OptionStore(Path(model_file))
+    store = store or ResultStore()
+
+    # the design options are not evicted from the cache until they are uploaded
+    with Pins() as pins:
+        design_options, model_files = generate_options(
+            option_store, design_combinations, workers, pins=pins)
+        log(f'Wrote {len(model_files)} design options.')
+
+        new_job = create_job(api_client, owner, project, design_options, model_files,
+                             Path(epw_file), Path(ddy_file),
+                             option_numbers=design_options.option_numbers)
+    job = new_job.create()
+    log(f'Submitted {get_job_url(job)}')
+
+    status = wait_for_job(job, store, callback=lambda counts: log(
+        ', '.join(f'{count} {group}' for group, count in counts.items())))
+    if status != JobStatusEnum.completed:
+        raise RuntimeError(f'The job is {status.value}.')
+    return collect_results(job, store)
+
+
+def run_adaptive_study(model_file: Path, params_file: Path, epw_file: Path,
+                       ddy_file: Path, owner: str, project: str, api_client: ApiClient,
+                       batch_size: int, budget: int, criterion: str = CRITERIA[0],
+                       workers: int = None, store: ResultStore = None,
+                       log: Callable[[str], None] = print
+                       ) -> Tuple[AdaptiveStudy, ResultsTable]:
+    """Run a study in batches that are picked from the results of earlier batches.
+
+    Returns:
+        A tuple of the adaptive study and the results of all of its batches. The
+        option numbers of the results are indices in the full space.
+    """
+    design_combinations = load_combinations(params_file)
+    space = getattr(design_combinations, 'space', design_combinations)
+    option_store = OptionStore(Path(model_file))
+    store = store or ResultStore()
+    uploaded = {}
+
+    study = AdaptiveStudy(space, batch_size, budget, criterion)
+    tables = []
+    while not study.done:
+        batch = study.propose()
+        if not batch:
+            break
+        with Pins() as pins:
+            design_options, model_files = generate_options(
+                option_store, DesignSample(space, batch), workers, pins=pins)
+            new_job = create_job(api_client, owner, project, design_options,
+                                 model_files, Path(epw_file), Path(ddy_file),
+                                 option_numbers=design_options.option_numbers,
+                                 uploaded=uploaded)
+        job = new_job.create()
+        study.jobs.append(get_job_url(job))
+        study.pending = batch
+        log(f'Submitted batch {len(study.jobs)} with {len(batch)} runs: '
+            f'{study.jobs[-1]}')
+
+        status = wait_for_job(job, store)
+        if status != JobStatusEnum.completed:
+            raise RuntimeError(f'Batch {len(study.jobs)} is {status.value}.')
+        table = collect_results(job, store)
+        tables.append(table)
+        study.add_results(table.frame, table['eui'])
+        log(f'{len(study.evaluated)} of {study.budget} runs are evaluated.')
+
+    return study, ResultsTable.concat(tables)
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run a parametric study.')
+    parser.add_argument('model', type=Path, help='Path to the HBJSON model.')
+    parser.add_argument('params', type=Path, help='Path to the parameter file.')
+    parser.add_argument('epw', type=Path, help='Path to the EPW file.')
+    parser.add_argument('ddy', type=Path, help='Path to the DDY file.')
+    parser.add_argument('--owner', required=True, help='Pollination account name.')
+    parser.add_argument('--project', default='demo', help='Pollination project name.')
+    parser.add_argument(
+        '--api-key', default=os.environ.get('POLLINATION_API_KEY'),
+        help='Pollination API key. Defaults to the POLLINATION_API_KEY variable.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of processes to build the design options.')
+    parser.add_argument('--output', type=Path, default=Path('results.parquet'),
+                        help='Path to the Parquet file of the results.')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Submit the study in batches picked by a surrogate.')
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--budget', type=int, default=100)
+    parser.add_argument('--criterion', choices=CRITERIA, default=CRITERIA[0])
+    parser.add_argument('--metrics', type=Path, default=None,
+                        help='Path to a JSON file to write the timing of every step to.')
+    options = parser.parse_args(args)
+
+    if not options.api_key:
+        parser.error('A Pollination API key is required.')
+    api_client = ApiClient(api_token=options.api_key)
+
+    def log(message: str) -> None:
+        print(message, file=sys.stderr, flush=True)
+
+    study_args = (options.model, options.params, options.epw, options.ddy,
+                  options.owner, options.project, api_client)
+    # both modes write a ResultsTable so the app can load either file
+    if options.adaptive:
+        _, table = run_adaptive_study(
+            *study_args, options.batch_size, options.budget, options.criterion,
+            workers=options.workers, log=log)
+    else:
+        table = run_study(*study_args, workers=options.workers, log=log)
+    table.to_parquet(options.output)
+    log(f'Results are written to {options.output}')
+    if options.metrics:
+        options.metrics.write_text(METRICS.to_json())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
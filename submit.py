@@ -1,27 +1,29 @@
 """A module to create the runs and submit the job to Pollination."""
 
 import streamlit as st
-import time
 
-from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 from pollination_streamlit.api.client import ApiClient
-from pollination_streamlit.interactors import Job, NewJob, Recipe
+from pollination_streamlit.interactors import Job, NewJob
 
+from adaptive import CRITERIA, AdaptiveStudy
+from results import SimStatus, get_eui, get_poller, to_sim_status
+from cache import Pins
+from sampling import DesignSample
+from store import DesignOptions
+from study import create_job as create_study_job, get_job_url
 
-def _get_annual_energy_recipe(api_client):
-    return Recipe('ladybug-tools', 'annual-energy-use', 'latest', api_client)
 
+STUDY_MODES = ['Submit all design options', 'Adaptive']
 
-def create_job(design_options) -> NewJob:
+
+def create_job(design_options: DesignOptions) -> NewJob:
     api_key = st.text_input('Enter your Pollination API key', type='password')
     st.session_state.api_key = api_key
     api_client = ApiClient(api_token=api_key)
     if not (api_key and api_client):
         return
 
-    recipe = _get_annual_energy_recipe(api_client)
-
     st.subheader('Submission information')
     owner = st.text_input('Account name')
     project = st.text_input('Project name', value='demo')
@@ -38,30 +40,37 @@ def create_job(design_options) -> NewJob:
     if not (owner and epw and ddy):
         return
 
-    new_job = NewJob(owner, project, recipe, client=api_client)
-
-    epw_path = new_job.upload_artifact(epw_file, '.')
-    ddy_path = new_job.upload_artifact(ddy_file, '.')
-
-    arguments = []
-    for num, design_option in enumerate(design_options):
-        # TODO: find a better way to use the design_option dict
-        argument = {}
-        model_path = new_job.upload_artifact(Path(design_option['model']), '.')
-        argument['model'] = model_path
-        argument['epw'] = epw_path
-        argument['ddy'] = ddy_path
-        argument['viz-variables'] = '-v "Zone Mean Radiant Temperature"'
-        argument['option-no'] = num
-        if 'Window to wall ratio' in design_option:
-            argument['window-to-wall-ratio'] = design_option['Window to wall ratio']
-        if 'Louver count' in design_option:
-            argument['louver-count'] = design_option['Louver count']
-        if 'Louver depth' in design_option:
-            argument['louver-depth'] = design_option['Louver depth']
-        arguments.append(argument)
-
-    new_job.arguments = arguments
+    # write the full HBJSON of every design option before uploading them. They are
+    # not evicted from the cache until they are uploaded.
+    pins = Pins()
+    model_files = [None] * len(design_options)
+    progress = st.progress(0)
+    for count, (num, hbjson_file) in enumerate(
+            design_options.write(pins=pins), start=1):
+        model_files[num] = hbjson_file
+        progress.progress(count / len(design_options))
+    progress.empty()
+
+    # upload the files on a thread pool and skip the ones that are already uploaded
+    # in this session
+    if 'uploaded_artifacts' not in st.session_state:
+        st.session_state.uploaded_artifacts = {}
+    progress = st.progress(0)
+    status = st.empty()
+
+    def report(done, total, size, elapsed):
+        progress.progress(done / total)
+        speed = size / elapsed / 1024 ** 2 if elapsed else 0
+        status.write(f'Uploaded {done} of {total} files ({speed:.1f} MB/s).')
+
+    with pins:
+        new_job = create_study_job(
+            api_client, owner, project, design_options, model_files, epw_file,
+            ddy_file, option_numbers=design_options.option_numbers,
+            uploaded=st.session_state.uploaded_artifacts, callback=report
+        )
+    progress.empty()
+    status.empty()
 
     return new_job
 
@@ -71,15 +80,100 @@ def submit_job(job: NewJob) -> Job:
     return running_job
 
 
-def submit(design_options: dict):
+def start_job(new_job: NewJob) -> str:
+    """Submit a job, start tracking its status and return its URL."""
+    running_job = submit_job(new_job)
+    # start tracking the status in the background instead of waiting here
+    st.session_state.job = running_job
+    get_poller(running_job)
+    return get_job_url(running_job)
+
+
+def get_adaptive_study() -> Optional[AdaptiveStudy]:
+    """Get the adaptive study of the current design combinations.
+
+    Returns None if there are no design combinations.
+    """
+    combinations = st.session_state.design_combinations
+    # an adaptive study picks its runs from the full space
+    space = getattr(combinations, 'space', combinations)
+
+    if len(space) == 0:
+        st.error('There are no design combinations. Go back to step 2 to change the '
+                 'parameters.')
+        return None
+
+    batch_column, budget_column, criterion_column = st.columns(3)
+    batch_size = batch_column.number_input(
+        'Runs per batch', min_value=1, value=min(20, len(space)), step=1)
+    run_budget = budget_column.number_input(
+        'Run budget', min_value=1, value=min(100, len(space)), step=1)
+    criterion = criterion_column.selectbox('Criterion', CRITERIA)
+
+    study = st.session_state.get('adaptive_study', None)
+    if study is None or study.space != space:
+        study = AdaptiveStudy(space, int(batch_size), int(run_budget), criterion)
+        st.session_state.adaptive_study = study
+    else:
+        study.batch_size = int(batch_size)
+        study.budget = min(int(run_budget), len(space))
+        study.criterion = criterion
+    return study
+
+
+def submit_adaptive():
+    """Submit a study in batches that are picked from the results of earlier batches."""
+    study = get_adaptive_study()
+    if study is None:
+        return
+    st.write(f'{len(study.evaluated)} of {study.budget} runs are evaluated in '
+             f'{len(study.jobs)} batches.')
+    if study.evaluated:
+        st.dataframe(study.results().head(10))
+
+    if study.pending:
+        job = st.session_state.job
+        poller = get_poller(job)
+        if not poller.finished:
+            st.info('Waiting for the current batch to finish.')
+            st.button('Refresh')
+            return
+        if to_sim_status(poller.job_status) != SimStatus.COMPLETE:
+            st.error('The last batch did not complete. Submit it again.')
+            study.pending = []
+            return
+        study.add_results(job.runs_dataframe.dataframe, get_eui(job))
+
+    batch = [] if study.done else study.propose()
+    if not batch:
+        st.success('The adaptive study is done. Move to the next tab.')
+        return
+
+    design_options = DesignOptions(
+        st.session_state.option_store, DesignSample(study.space, batch))
+    new_job = create_job(design_options)
+
+    if new_job:
+        submit = st.button(label='Submit Next Batch')
+        if submit:
+            job_url = start_job(new_job)
+            study.pending = batch
+            study.jobs.append(job_url)
+            st.success('Batch submitted to Pollination.')
+            return job_url
+
+
+def submit(design_options: DesignOptions):
+
+    mode = st.radio('Study mode', STUDY_MODES)
+    if mode == 'Adaptive':
+        return submit_adaptive()
 
     new_job = create_job(design_options)
 
     if new_job:
         submit = st.button(label='Submit Job')
         if submit:
-            running_job = submit_job(new_job)
-            time.sleep(2)
-            job_url = f'https://app.pollination.cloud/{running_job.owner}/projects/{running_job.project}/jobs/{running_job.id}'
+            job_url = start_job(new_job)
             st.success('Job submitted to Pollination. Move to the next tab.')
             return job_url
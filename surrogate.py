@@ -0,0 +1,177 @@
+"""A Gaussian process surrogate model of the EUI over the study parameters."""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from combinations import CombinationSpace
+
+
+# length scales that are tried when the surrogate is fitted
+LENGTH_SCALES = [0.1, 0.2, 0.35, 0.5, 0.75, 1.0, 1.5, 2.0]
+
+# maximum number of runs that the surrogate is fitted to
+MAX_POINTS = 2000
+
+
+def results_features(df: DataFrame, space: CombinationSpace,
+                     parameters: List[str]) -> np.ndarray:
+    """Get the parameter values of the runs of a job as an array.
+
+    The values are taken from the combination of the option number of each run and
+    not from the run arguments. Options without louvers don't have louver arguments
+    but their combination still has a louver count and depth.
+    """
+    return combination_features(
+        (space[int(option_no)] for option_no in df['option-no']), parameters)
+
+
+def combination_features(combinations, parameters: List[str]) -> np.ndarray:
+    """Get the parameter values of a collection of design combinations as an array."""
+    return np.array(
+        [[combination[parameter] for parameter in parameters]
+         for combination in combinations], dtype=float
+    ).reshape(-1, len(parameters))
+
+
+class Surrogate:
+    """A Gaussian process regression with an RBF kernel.
+
+    The inputs are scaled to a unit hypercube and the outputs are standardized before
+    fitting. The length scale is chosen by the log marginal likelihood.
+
+    Args:
+        parameters: Names of the study parameters in the order of the input columns.
+        noise: Noise variance of the standardized outputs.
+    """
+
+    def __init__(self, parameters: List[str], noise: float = 1e-4):
+        self.parameters = parameters
+        self.noise = noise
+        self.length_scale = None
+        self._lower = None
+        self._scale = None
+        self._mean = 0.0
+        self._std = 1.0
+        self._x = None
+        self._chol = None
+        self._alpha = None
+
+    def _scaled(self, x: np.ndarray) -> np.ndarray:
+        return (np.asarray(x, dtype=float) - self._lower) / self._scale
+
+    def _kernel(self, a: np.ndarray, b: np.ndarray, length_scale: float) -> np.ndarray:
+        distance = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=-1)
+        return np.exp(-0.5 * distance / length_scale ** 2)
+
+    def _solve(self, x: np.ndarray, y: np.ndarray,
+               length_scale: float) -> Tuple[np.ndarray, np.ndarray, float]:
+        kernel = self._kernel(x, x, length_scale)
+        kernel[np.diag_indices_from(kernel)] += self.noise
+        chol = np.linalg.cholesky(kernel)
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, y))
+        likelihood = -0.5 * y @ alpha - np.log(np.diag(chol)).sum()
+        return chol, alpha, likelihood
+
+    def fit(self, x: np.ndarray, y: List[float]) -> 'Surrogate':
+        """Fit the surrogate to simulated results.
+
+        Args:
+            x: Parameter values with one row per run and one column per parameter.
+            y: EUI of the runs.
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(y) > MAX_POINTS:
+            # the cost of the fit grows with the cube of the number of points
+            keep = np.random.default_rng(0).choice(len(y), MAX_POINTS, replace=False)
+            x, y = x[keep], y[keep]
+        self._lower = x.min(axis=0)
+        spread = x.max(axis=0) - self._lower
+        self._scale = np.where(spread > 0, spread, 1.0)
+        self._mean = y.mean()
+        self._std = y.std() or 1.0
+        self._x = self._scaled(x)
+        target = (y - self._mean) / self._std
+
+        best = None
+        for length_scale in LENGTH_SCALES:
+            try:
+                chol, alpha, likelihood = self._solve(self._x, target, length_scale)
+            except np.linalg.LinAlgError:
+                continue
+            if best is None or likelihood > best[3]:
+                best = (length_scale, chol, alpha, likelihood)
+
+        if best is None:
+            raise ValueError('Failed to fit the surrogate to the results.')
+        self.length_scale, self._chol, self._alpha, _ = best
+        return self
+
+    def predict(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict the EUI for parameter values.
+
+        Returns:
+            A tuple of the predicted EUI and its standard deviation.
+        """
+        x = self._scaled(x).reshape(-1, len(self.parameters))
+        cross = self._kernel(x, self._x, self.length_scale)
+        mean = cross @ self._alpha
+        v = np.linalg.solve(self._chol, cross.T)
+        variance = np.maximum(1 - (v ** 2).sum(axis=0), 0)
+        return mean * self._std + self._mean, np.sqrt(variance) * self._std
+
+    def predict_space(self, space: CombinationSpace,
+                      chunk_size: int = 2048) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict the EUI for every combination of a space."""
+        means, stds = [], []
+        for chunk in space.chunks(chunk_size):
+            mean, std = self.predict(combination_features(chunk, self.parameters))
+            means.append(mean)
+            stds.append(std)
+        return np.concatenate(means), np.concatenate(stds)
+
+    def sensitivity(self, space: CombinationSpace,
+                    mean: np.ndarray = None) -> Dict[str, float]:
+        """Get the first order sensitivity index of every parameter.
+
+        The index is the variance of the mean predicted EUI for each value of a
+        parameter divided by the total variance of the predicted EUI over the space.
+
+        Args:
+            space: The space of design combinations.
+            mean: The predicted EUI of every combination of the space if it is
+                already predicted.
+        """
+        if mean is None:
+            mean, _ = self.predict_space(space)
+        total = mean.var()
+        if total == 0:
+            return {parameter: 0.0 for parameter in self.parameters}
+
+        # the last parameter changes the fastest in a CombinationSpace
+        keys = list(space.parameters.keys())
+        grid = mean.reshape([len(space.parameters[key]) for key in keys])
+        indices = {}
+        for parameter in self.parameters:
+            axis = keys.index(parameter)
+            other_axes = tuple(a for a in range(len(keys)) if a != axis)
+            indices[parameter] = float(grid.mean(axis=other_axes).var() / total)
+        return indices
+
+
+def fit_surrogate(df: DataFrame, eui: List[float], space: CombinationSpace) -> Surrogate:
+    """Fit a surrogate to the results of a job for the parameters of a space.
+
+    The option numbers of the runs are the indices of their combinations in the
+    space. Runs with an option number outside of the space are not used.
+    """
+    option_numbers = df['option-no'].to_numpy()
+    valid = (option_numbers >= 0) & (option_numbers < len(space))
+    if valid.sum() < 2:
+        raise ValueError('The option numbers of the results are not in the design space.')
+    parameters = list(space.parameters.keys())
+    surrogate = Surrogate(parameters)
+    return surrogate.fit(results_features(df[valid], space, parameters),
+                         np.asarray(eui, dtype=float)[valid])
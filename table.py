@@ -0,0 +1,127 @@
+"""A typed columnar table of the results of a parametric study."""
+
+from io import BytesIO
+from pathlib import Path
+from typing import List, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame, concat, read_parquet
+from pandas.util import hash_pandas_object
+
+from combinations import ARGUMENT_NAMES
+
+
+# column types of the table. Parameter columns are float so runs without a
+# parameter can be NaN.
+COLUMN_TYPES = {
+    'run-id': 'string',
+    'option-no': 'int64',
+    'eui': 'float64',
+}
+COLUMN_TYPES.update({column: 'float64' for column in ARGUMENT_NAMES.values()})
+
+
+class ResultsTable:
+    """Results of the runs of a study with one row per run.
+
+    The rows are indexed by run id and every column is a typed NumPy array.
+
+    Args:
+        frame: A dataframe with a run-id and an option-no column, a column for each
+            study parameter and an eui column.
+    """
+
+    def __init__(self, frame: DataFrame):
+        columns = [column for column in COLUMN_TYPES if column in frame.columns]
+        self.frame = frame[columns].astype(
+            {column: COLUMN_TYPES[column] for column in columns})
+        self.frame.index = self.frame['run-id'].to_numpy() \
+            if 'run-id' in columns else self.frame['option-no'].to_numpy()
+
+    @classmethod
+    def from_results(cls, df: DataFrame, eui: List[float],
+                     run_ids: List[str] = None) -> 'ResultsTable':
+        """Create a table from the runs dataframe of a job and the EUI of its runs.
+
+        Args:
+            df: The runs dataframe of a job.
+            eui: EUI of the runs in the order of the dataframe rows.
+            run_ids: Ids of the runs in the order of the dataframe rows.
+        """
+        frame = df.reindex(
+            columns=['option-no'] + [c for c in ARGUMENT_NAMES.values() if c in df.columns]
+        ).reset_index(drop=True)
+        frame['eui'] = np.asarray(eui, dtype=float)
+        frame['run-id'] = run_ids if run_ids is not None else \
+            frame['option-no'].astype(str)
+        return cls(frame)
+
+    @classmethod
+    def concat(cls, tables: List['ResultsTable']) -> 'ResultsTable':
+        """Create a table from the runs of several tables.
+
+        Parameters that are not in every table are NaN for the runs without them.
+        """
+        if not tables:
+            return cls(DataFrame(columns=list(COLUMN_TYPES)))
+        return cls(concat([table.frame for table in tables], ignore_index=True))
+
+    @classmethod
+    def from_parquet(cls, source: Union[Path, bytes]) -> 'ResultsTable':
+        """Load a table from a Parquet file or the content of one."""
+        if isinstance(source, bytes):
+            source = BytesIO(source)
+        return cls(read_parquet(source))
+
+    def to_parquet(self, file_path: Path = None) -> bytes:
+        """Write the table as Parquet.
+
+        Returns:
+            The content of the Parquet file. It is also written to file_path if it
+            is provided.
+        """
+        data = self.frame.to_parquet(index=False)
+        if file_path is not None:
+            file_path.write_bytes(data)
+        return data
+
+    @property
+    def key(self) -> str:
+        """A hash of the content of the table to find out if the results have changed."""
+        return str(hash_pandas_object(self.frame, index=False).sum())
+
+    def __len__(self) -> int:
+        return len(self.frame.index)
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.frame[column].to_numpy()
+
+    def __contains__(self, column: str) -> bool:
+        return column in self.frame.columns
+
+    def __repr__(self) -> str:
+        return f'ResultsTable: {len(self)} runs'
+
+    @property
+    def parameter_columns(self) -> List[str]:
+        """The columns of the study parameters in the table."""
+        return [column for column in ARGUMENT_NAMES.values() if column in self]
+
+    def filter(self, **ranges: Tuple[float, float]) -> 'ResultsTable':
+        """Get the runs with values inside a range for one or more columns.
+
+        Column names use underscores instead of dashes, for instance
+        table.filter(eui=(0, 100), louver_count=(1, 3)).
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for name, (lower, upper) in ranges.items():
+            values = self[name.replace('_', '-')]
+            mask &= (values >= lower) & (values <= upper)
+        return ResultsTable(self.frame[mask])
+
+    def sort(self, column: str = 'eui', ascending: bool = True) -> 'ResultsTable':
+        """Get the runs sorted by a column."""
+        order = np.argsort(self[column], kind='stable')
+        if not ascending:
+            order = order[::-1]
+        return ResultsTable(self.frame.iloc[order])
@@ -0,0 +1,80 @@
+"""Upload study files to a Pollination project on a thread pool."""
+
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List
+
+from cache import hash_file
+from metrics import add_bytes, span
+
+
+def upload_with_retry(job, file_path: Path, retries: int = 3,
+                      backoff: float = 1.0) -> str:
+    """Upload a file to the project of a job and retry if it fails.
+
+    The wait between the attempts is doubled after every failed attempt.
+    """
+    for attempt in range(retries + 1):
+        try:
+            with span('upload'):
+                artifact_path = job.upload_artifact(file_path, '.')
+            add_bytes('upload', written=file_path.stat().st_size)
+            return artifact_path
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def upload_files(job, files: List[Path], uploaded: Dict[str, str] = None,
+                 workers: int = 8, retries: int = 3,
+                 callback: Callable[[int, int, int, float], None] = None) -> List[str]:
+    """Upload files to the project of a job.
+
+    Files that have the same content as a file that is already uploaded are skipped.
+
+    Args:
+        job: The NewJob to upload the files for.
+        files: A list of paths to the files.
+        uploaded: A dictionary of the uploaded files keyed by the hash of their
+            content. It is updated with the new uploads and can be kept between
+            calls to skip files that are already uploaded.
+        workers: Maximum number of concurrent uploads.
+        retries: Number of times to retry a failed upload.
+        callback: A function that is called after every upload with the number of
+            finished files, the total number of files, the uploaded bytes and the
+            elapsed time in seconds.
+
+    Returns:
+        A list of the uploaded artifact paths in the same order as the files.
+    """
+    uploaded = {} if uploaded is None else uploaded
+    hashes = [f'{job.owner}/{job.project}/{hash_file(file_path)}' for file_path in files]
+
+    # one upload for each unique content that is not uploaded yet
+    pending = {}
+    for file_path, file_hash in zip(files, hashes):
+        if file_hash not in uploaded and file_hash not in pending:
+            pending[file_hash] = file_path
+
+    start = time.time()
+    done = len(files) - len(pending)
+    size = 0
+    if callback:
+        callback(done, len(files), size, 0)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(upload_with_retry, job, file_path, retries): file_hash
+            for file_hash, file_path in pending.items()
+        }
+        for future in as_completed(futures):
+            file_hash = futures[future]
+            uploaded[file_hash] = future.result()
+            done += 1
+            size += pending[file_hash].stat().st_size
+            if callback:
+                callback(done, len(files), size, time.time() - start)
+
+    return [uploaded[file_hash] for file_hash in hashes]
@@ -1,35 +1,45 @@
 """A module to add a Pollination 3D viewer to the app."""
 
+import os
 import streamlit as st
 from pathlib import Path
-from honeybee_vtk.model import Model as VTKModel
 from pollination_streamlit_viewer import viewer
 from honeybee.model import Model as HBModel
 from pollination_streamlit_io import button, inputs
+from converter import create_vtkjs
+from cache import MemoryCache, hash_file
+from ingest import cached_model
 
 
-@st.cache()
-def create_vtkjs(hb_model_path: Path) -> Path:
-    if not hb_model_path:
-        return
+# in-memory payloads of the viewer keyed by the hash of the HBJSON content
+VIEWER_CACHE_SIZE = int(os.environ.get('VIEWER_CACHE_SIZE', 256 * 1024 ** 2))
+_vtkjs_payloads = MemoryCache(VIEWER_CACHE_SIZE)
+_model_payloads = MemoryCache(VIEWER_CACHE_SIZE)
 
-    model = VTKModel.from_hbjson(hb_model_path.as_posix())
 
-    vtkjs_folder = st.session_state.temp_folder.joinpath('vtkjs')
-    if not vtkjs_folder.exists():
-        vtkjs_folder.mkdir(parents=True, exist_ok=True)
+def get_vtkjs_payload(hb_model_path: Path) -> bytes:
+    """Get the content of the VTKJS file of an HBJSON model."""
+    key = hash_file(hb_model_path)
+    content = _vtkjs_payloads.get(key)
+    if content is None:
+        content = create_vtkjs(hb_model_path).read_bytes()
+        _vtkjs_payloads.put(key, content, len(content))
+    return content
 
-    vtkjs_file = vtkjs_folder.joinpath(f'{hb_model_path.stem}.vtkjs')
-    if not vtkjs_file.is_file():
-        model.to_vtkjs(
-            folder=vtkjs_folder.as_posix(),
-            name=hb_model_path.stem
-        )
 
-    return vtkjs_file
+def get_model_payload(hb_model_path: Path) -> dict:
+    """Get the dictionary of an HBJSON model."""
+    key = hash_file(hb_model_path)
+    model_data = _model_payloads.get(key)
+    if model_data is None:
+        # reuse the parsed model if the model is ingested
+        model = cached_model(key) or HBModel.from_hbjson(hb_model_path.as_posix())
+        model_data = model.to_dict()
+        _model_payloads.put(key, model_data, hb_model_path.stat().st_size)
+    return model_data
 
 
-def rhino_hbjson(hb_model: HBModel, bake: bool = True) -> None:
+def rhino_hbjson(model_data: dict, bake: bool = True) -> None:
     """Visualize and bake HBJSON in rhino."""
 
     if bake:
@@ -37,7 +47,7 @@ def rhino_hbjson(hb_model: HBModel, bake: bool = True) -> None:
 
         with col1:
             inputs.send(
-                data=hb_model.to_dict(),
+                data=model_data,
                 is_pollination_model=True,
                 default_checked=True,
                 label='View model',
@@ -48,7 +58,7 @@ def rhino_hbjson(hb_model: HBModel, bake: bool = True) -> None:
         with col2:
             button.send(
                 'BakePollinationModel',
-                hb_model.to_dict(),
+                model_data,
                 'bake-geometry-key',
                 options={
                     "layer": "hbjson",
@@ -58,7 +68,7 @@ def rhino_hbjson(hb_model: HBModel, bake: bool = True) -> None:
             )
     else:
         inputs.send(
-            data=hb_model.to_dict(),
+            data=model_data,
             is_pollination_model=True,
             default_checked=True,
             label='View model',
@@ -71,16 +81,6 @@ def render(hb_model_path: Path, key='3d_viewer', subscribe=False, bake=True):
     """Render HBJSON."""
 
     if st.session_state.host.lower() == 'rhino':
-        hb_model = HBModel.from_hbjson(hb_model_path.as_posix())
-        rhino_hbjson(hb_model, bake=bake)
+        rhino_hbjson(get_model_payload(hb_model_path), bake=bake)
     else:
-        vtkjs_name = f'{hb_model_path.stem}_vtkjs'
-
-        if vtkjs_name not in st.session_state:
-            vtkjs = create_vtkjs(hb_model_path)
-            viewer(content=vtkjs.read_bytes(),
-                   key=key, subscribe=subscribe)
-            st.session_state[vtkjs_name] = vtkjs
-        else:
-            viewer(content=st.session_state[vtkjs_name].read_bytes(),
-                   key=key, subscribe=subscribe)
+        viewer(content=get_vtkjs_payload(hb_model_path), key=key, subscribe=subscribe)
@@ -1,36 +1,143 @@
 """Visualize the results of a parametric study."""
 
 
+import numpy as np
 import streamlit as st
 
-from typing import List
+from pathlib import Path
+from typing import List, Optional
 from plotly import graph_objects as go
 from plotly.graph_objects import Figure
 from pandas import DataFrame
 
 from viewer import render
+from combinations import CombinationSpace
+from surrogate import Surrogate, combination_features, fit_surrogate
+from table import ResultsTable
+from query import ResultsIndex
+from pareto import front_options, rank_options
+from store import DesignOptions
 
 
-def get_figure(df: DataFrame, eui: List[float]) -> Figure:
-    """Prepare Plotly Parallel Coordinates plot."""
+PLOT_TYPES = ['Parallel coordinates', 'Scatter matrix']
+
+QUERY_MODES = ['Option number', 'Lowest EUI', 'Range', 'Nearest design', 'Pareto front']
+
+# number of runs that are listed for a nearest design query
+NEAREST_COUNT = 5
+
+# number of the next options of a query whose models are fetched in the background
+PREFETCH_COUNT = 3
+
+# maximum number of lines that are drawn in the parallel coordinates plot
+MAX_LINES = 2000
+
+# maximum number of points that are drawn in every plot of the scatter matrix
+MAX_POINTS = 20000
+
+# number of bins of every column that the runs are aggregated in before the bins are
+# made coarser
+MAX_BINS = 256
+
+LABELS = {
+    'option-no': 'Option-no',
+    'eui': 'EUI',
+    'window-to-wall-ratio': 'WWR',
+    'louver-count': 'Louver count',
+    'louver-depth': 'Louver depth',
+}
+
+# colors of the runs that are on the Pareto front and the rest of the runs
+FRONT_COLOR = 'rgb(228, 61, 106)'
+OTHER_COLOR = 'rgb(190, 190, 190)'
+
+
+def _bin(values: np.ndarray, bins: int) -> np.ndarray:
+    """Get the index of the equal width bin of every value. NaN values get -1."""
+    finite = values[~np.isnan(values)]
+    if not len(finite) or finite.max() == finite.min():
+        codes = np.zeros(len(values), dtype=int)
+    else:
+        scaled = (values - finite.min()) / (finite.max() - finite.min()) * bins
+        codes = np.minimum(np.nan_to_num(scaled), bins - 1).astype(int)
+    codes[np.isnan(values)] = -1
+    return codes
+
+
+def reduce_results(table: ResultsTable, max_rows: int = MAX_LINES,
+                   front: np.ndarray = None) -> ResultsTable:
+    """Aggregate the runs to at most max_rows rows.
+
+    The EUI and the parameters are binned on a grid that is made coarser until there
+    are at most max_rows bins with runs in them. Every bin is one row with the mean
+    values of its runs and the lowest option number. The runs on the Pareto front
+    are not aggregated.
+    """
+    if len(table) <= max_rows:
+        return table
+    keep = np.zeros(len(table), dtype=bool) if front is None else front
+    rest = table.frame[~keep]
+    columns = ['eui'] + table.parameter_columns
+    limit = max(max_rows - int(keep.sum()), 1)
+
+    bins = MAX_BINS
+    while True:
+        groups = rest.groupby(
+            [_bin(rest[column].to_numpy(dtype=float), bins) for column in columns],
+            sort=False)
+        if groups.ngroups <= limit or bins == 1:
+            break
+        bins //= 2
+
+    aggregation = {column: 'mean' for column in columns}
+    aggregation.update({'option-no': 'min', 'run-id': 'first'})
+    aggregated = groups.agg(aggregation).reset_index(drop=True)
+    return ResultsTable.concat([ResultsTable(table.frame[keep]),
+                                ResultsTable(aggregated)])
+
+
+def _values(table: ResultsTable, column: str) -> np.ndarray:
+    # fewer digits make the figure smaller. Rounding a float32 array would add digits
+    # back when it is written as JSON.
+    return table[column].astype(float).round(4)
+
+
+def _front_mask(table: ResultsTable, front_options: List[int]) -> np.ndarray:
+    return np.isin(table['option-no'], front_options)
+
+
+def get_figure(table: ResultsTable, front_options: List[int] = None) -> Figure:
+    """Prepare Plotly Parallel Coordinates plot.
+
+    Large studies are reduced with reduce_results to keep the plot responsive. If
+    front_options are provided the runs on the Pareto front are highlighted.
+    """
+    front = None if front_options is None else _front_mask(table, front_options)
+    table = reduce_results(table, front=front)
 
     dimension = [
-        dict(label='Option-no', values=df['option-no']),
-        dict(label='EUI', values=eui)
+        dict(label='Option-no', values=table['option-no']),
+        dict(label='EUI', values=_values(table, 'eui'))
     ]
 
-    if 'window-to-wall-ratio' in df.columns:
+    if 'window-to-wall-ratio' in table:
         dimension.append(
-            dict(label='WWR', values=df['window-to-wall-ratio'].values, range=[0, 1]))
-    if 'louver-count' in df.columns:
+            dict(label='WWR', values=_values(table, 'window-to-wall-ratio'),
+                 range=[0, 1]))
+    if 'louver-count' in table:
         dimension.append(
-            dict(label='Louver count', values=df['louver-count'].values))
-    if 'louver-depth' in df.columns:
+            dict(label='Louver count', values=_values(table, 'louver-count')))
+    if 'louver-depth' in table:
         dimension.append(
-            dict(label='Louver depth', values=df['louver-depth'].values))
+            dict(label='Louver depth', values=_values(table, 'louver-depth')))
+
+    if front_options is None:
+        line = dict(color=FRONT_COLOR)
+    else:
+        line = dict(color=_front_mask(table, front_options).astype(int),
+                    colorscale=[[0, OTHER_COLOR], [1, FRONT_COLOR]], cmin=0, cmax=1)
 
-    figure = go.Figure(data=go.Parcoords(
-        line=dict(color='rgb(228, 61, 106)'), dimensions=dimension))
+    figure = go.Figure(data=go.Parcoords(line=line, dimensions=dimension))
 
     figure.update_layout(
         font=dict(size=15)
@@ -39,17 +146,251 @@ def get_figure(df: DataFrame, eui: List[float]) -> Figure:
     return figure
 
 
-def visualize(viz_dict, df, eui):
+def get_scatter_matrix(table: ResultsTable, front_options: List[int] = None) -> Figure:
+    """Prepare a WebGL scatter matrix of the EUI and the parameters of every run.
+
+    Large studies are reduced with reduce_results to keep the plot responsive. If
+    front_options are provided the runs on the Pareto front are highlighted.
+    Otherwise the runs are colored by EUI.
+    """
+    front = None if front_options is None else _front_mask(table, front_options)
+    table = reduce_results(table, MAX_POINTS, front)
+
+    columns = ['eui'] + table.parameter_columns
+    dimension = [dict(label=LABELS[column], values=_values(table, column))
+                 for column in columns]
+
+    if front_options is None:
+        marker = dict(size=4, color=_values(table, 'eui'), colorscale='Plasma',
+                      showscale=True)
+    else:
+        marker = dict(size=4, color=_front_mask(table, front_options).astype(int),
+                      colorscale=[[0, OTHER_COLOR], [1, FRONT_COLOR]], cmin=0, cmax=1)
+
+    figure = go.Figure(data=go.Splom(
+        dimensions=dimension, showupperhalf=False, diagonal_visible=False,
+        text=table['option-no'], marker=marker
+    ))
+
+    figure.update_layout(
+        font=dict(size=15),
+        height=200 * len(columns)
+    )
+
+    return figure
+
+
+def get_cached_figure(table: ResultsTable, plot_type: str) -> Figure:
+    """Get a figure of the results and only build it again if the results change.
+
+    The runs on the Pareto front are highlighted.
+    """
+    cache = st.session_state.setdefault('figure_cache', {})
+    key = (table.key, plot_type)
+    if key not in cache:
+        cache.clear()
+        front_options = get_front_options(table)
+        cache[key] = get_scatter_matrix(table, front_options) \
+            if plot_type == 'Scatter matrix' else get_figure(table, front_options)
+    return cache[key]
 
-    figure = get_figure(df, eui)
-    st.plotly_chart(figure)
 
-    option_num = st.text_input('Option number', value='0')
+def get_ranking(table: ResultsTable) -> DataFrame:
+    """Get the Pareto ranking of the results and compute it again if they change."""
+    if st.session_state.get('ranking_key') != table.key:
+        st.session_state.ranking = rank_options(table)
+        st.session_state.ranking_key = table.key
+    return st.session_state.ranking
+
+
+def get_front_options(table: ResultsTable) -> List[int]:
+    """Get the option numbers of the runs on the Pareto front.
+
+    Only the first front is needed to highlight the plots. The full ranking is only
+    computed by get_ranking when the Pareto front query is used.
+    """
+    if st.session_state.get('front_key') != table.key:
+        st.session_state.front_options = front_options(table)
+        st.session_state.front_key = table.key
+    return st.session_state.front_options
+
+
+def get_surrogate(table: ResultsTable, space: CombinationSpace) -> Surrogate:
+    """Get the surrogate model of the results and fit it if the results have changed.
+
+    The predictions over the space and the sensitivity of the parameters are kept
+    with the fit because they take as long as the fit for a large space.
+    """
+    key = (table.key, space)
+    if st.session_state.get('surrogate_key') != key:
+        surrogate = fit_surrogate(table.frame, table['eui'], space)
+        mean, std = surrogate.predict_space(space)
+        st.session_state.surrogate = surrogate
+        st.session_state.surrogate_prediction = (mean, std)
+        st.session_state.surrogate_sensitivity = surrogate.sensitivity(space, mean)
+        st.session_state.surrogate_key = key
+    return st.session_state.surrogate
+
+
+def surrogate_analysis(table: ResultsTable) -> None:
+    """Predict the EUI of design options that are not simulated."""
+    combinations = st.session_state.get('design_combinations', None)
+    if combinations is None or len(table) < 2:
+        return
+    # use the full space even if only a sample of it is simulated
+    space = getattr(combinations, 'space', combinations)
+
+    with st.expander('Surrogate model'):
+        try:
+            surrogate = get_surrogate(table, space)
+        except ValueError as error:
+            st.warning(f'Failed to fit a surrogate to the results: {error}')
+            return
+        if not surrogate.parameters:
+            st.warning('The results do not have any parameters to fit a surrogate to.')
+            return
+
+        st.subheader('Sensitivity')
+        sensitivity = st.session_state.surrogate_sensitivity
+        st.bar_chart(DataFrame({'Sensitivity': sensitivity}))
+
+        st.subheader('Predict EUI')
+        query = {}
+        for column, parameter in zip(st.columns(len(surrogate.parameters)),
+                                     surrogate.parameters):
+            query[parameter] = column.selectbox(
+                parameter, space.parameters[parameter], key=f'surrogate-{parameter}')
+        mean, std = surrogate.predict(
+            combination_features([query], surrogate.parameters))
+        st.write(f'Predicted EUI: {mean[0]:.2f} ± {std[0]:.2f}')
+
+        st.subheader('Most uncertain design options')
+        mean, std = st.session_state.surrogate_prediction
+        uncertain = np.argsort(-std)[:10]
+        predictions = DataFrame(space[int(index)] for index in uncertain)
+        predictions['Predicted EUI'] = mean[uncertain]
+        predictions['Uncertainty'] = std[uncertain]
+        st.dataframe(predictions)
+
+
+def get_results_index(table: ResultsTable) -> ResultsIndex:
+    """Get the query index of the results and build it again if they change."""
+    if st.session_state.get('results_index_key') != table.key:
+        st.session_state.results_index = ResultsIndex(table)
+        st.session_state.results_index_key = table.key
+    return st.session_state.results_index
+
+
+def find_options(table: ResultsTable) -> List[int]:
+    """Query the results and get the option numbers of the matching runs."""
+    index = get_results_index(table)
+    mode = st.radio('Find design options by', QUERY_MODES)
+
+    if mode == 'Option number':
+        option_num = st.text_input('Option number', value='0')
+        try:
+            return [int(option_num)]
+        except ValueError:
+            return []
+
+    if mode == 'Lowest EUI':
+        count = st.number_input('Number of options', min_value=1, value=10, step=1)
+        positions = index.top_k(int(count))
+
+    elif mode == 'Range':
+        ranges = {}
+        for column in index.columns:
+            values = index.values(column)
+            if len(values) == 0 or values[0] == values[-1]:
+                continue
+            lower, upper = float(values[0]), float(values[-1])
+            selected = st.slider(
+                LABELS[column], lower, upper, (lower, upper), key=f'range-{column}')
+            # a column is only filtered if its range is narrowed
+            if selected != (lower, upper):
+                ranges[column.replace('-', '_')] = selected
+        positions = index.range(**ranges)
+
+    elif mode == 'Pareto front':
+        ranking = get_ranking(table)
+        front = ranking[ranking['Pareto rank'] == 0]
+        st.write(f'{len(front)} of {len(table)} design options are on the Pareto '
+                 f'front of {", ".join(ranking.columns[1:-1])}.')
+        st.dataframe(front)
+        return front['option-no'].tolist()
+
+    else:
+        design = {}
+        for column in table.parameter_columns:
+            values = np.unique(index.values(column))
+            if len(values) == 0:
+                continue
+            design[column] = st.select_slider(
+                LABELS[column], options=values.tolist(), key=f'nearest-{column}')
+        positions = index.nearest(design, k=NEAREST_COUNT)
+
+    st.dataframe(index.rows(positions[:100]))
+    return index.option_numbers(positions)
+
+
+def get_option_model(option_num: int,
+                     design_options: Optional[DesignOptions]) -> Optional[Path]:
+    """Get the HBJSON of a design option of the results.
+
+    The input model of the run is used if the job is known and its models are listed.
+    Otherwise the design option of this session is written again from its delta.
+    """
+    fetcher = st.session_state.get('model_fetcher', None)
+    if fetcher is not None:
+        try:
+            if option_num in fetcher.options:
+                return fetcher.get(option_num)
+        except Exception as error:
+            st.warning(f'Failed to get the model of the run: {error}')
+    delta = design_options.option(option_num) if design_options is not None else None
+    if delta is not None:
+        return design_options.store.get(delta)
+    return None
+
+
+def visualize(design_options: Optional[DesignOptions], table: ResultsTable):
+
+    plot_type = st.selectbox('Plot type', PLOT_TYPES)
+    limit = MAX_LINES if plot_type == 'Parallel coordinates' else MAX_POINTS
+    # the figure is sent to the browser again on every rerun of the app so the plot
+    # of a large study can be hidden while the results are queried
+    if st.checkbox('Show plot', value=True, key='show-plot'):
+        if len(table) > limit:
+            st.info(f'The {len(table)} runs are drawn as up to {limit} runs. Runs with '
+                    'similar values are drawn as one run with their mean values.')
+        st.plotly_chart(get_cached_figure(table, plot_type))
+
+    st.download_button(
+        'Download results as Parquet', data=table.to_parquet(),
+        file_name='results.parquet', mime='application/octet-stream'
+    )
+
+    surrogate_analysis(table)
+
+    options = find_options(table)
+    if not options:
+        st.error('No design options match the query.')
+        return
+    option_num = st.selectbox('Option to visualize', options)
 
-    try:
-        viz_dict[int(option_num)]
-    except (ValueError, KeyError):
-        st.error('Not a valid option number.')
+    hbjson_file = get_option_model(option_num, design_options)
+    fetcher = st.session_state.get('model_fetcher', None)
+    if hbjson_file is None:
+        if fetcher is not None and fetcher.resolving:
+            st.info('The models of the runs are being listed. Refresh in a moment to '
+                    'visualize the option.')
+            st.button('Refresh')
+        else:
+            st.error('Not a valid option number.')
         return
+    render(hbjson_file, key='results-viewer')
 
-    render(viz_dict[int(option_num)], key='results-viewer')
+    # get the next options of the query in the background
+    if fetcher is not None and fetcher.resolved:
+        position = options.index(option_num)
+        fetcher.prefetch(options[position + 1:position + 1 + PREFETCH_COUNT])
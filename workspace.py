@@ -0,0 +1,181 @@
+"""Bound the disk space of the session folders and the shared cache.
+
+Every session of the app gets a folder in the workspace for its uploads and
+downloads. The files that can be created again (VTKJS files, design option HBJSON
+files, model summaries and downloaded run models) are removed from the least recently
+used when a session or the whole workspace goes over its quota. The folders of the
+sessions that are not used for a while are removed.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from cache import CACHE_FOLDER, cache_folder, has_pinned, list_files, remove_least_recent
+
+
+# maximum size of the folder of a session in bytes
+SESSION_QUOTA = int(os.environ.get('SESSION_QUOTA', 1024 ** 3))
+
+# maximum size of the cache folder with all the sessions in bytes
+WORKSPACE_QUOTA = int(os.environ.get('WORKSPACE_QUOTA', 10 * 1024 ** 3))
+
+# number of seconds after the last use of a session before it is removed
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 24 * 60 * 60))
+
+# minimum number of seconds between two clean ups of the workspace
+CLEANUP_INTERVAL = 60
+
+# files in the cache folder that can be created again. Base models of the option
+# store and the result database are not in the list.
+REGENERABLE = [
+    ('vtkjs', '*.vtkjs'),
+    ('design_options', 'options/*.hbjson'),
+    ('models', '*.json'),
+    ('sessions', 'model/*.hbjson'),
+]
+
+# files in the folder of a session that can be downloaded again
+SESSION_REGENERABLE = ['model/*.hbjson']
+
+# name of the file that marks the last use of a session
+HEARTBEAT = '.last-used'
+
+_lock = threading.Lock()
+_last_cleanup = 0.0
+
+
+def _folder_usage(folder: Path) -> Tuple[int, int]:
+    files = list_files(folder)
+    return sum(size for _, size, _ in files), len(files)
+
+
+class Workspace:
+    """The folder of a session of the app.
+
+    Args:
+        session_id: A unique id of the session. A new id is created if it is not
+            provided.
+    """
+
+    def __init__(self, session_id: str = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.folder = cache_folder('sessions').joinpath(self.session_id)
+        self.touch()
+
+    def touch(self) -> None:
+        """Mark the session as used now."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.folder.joinpath(HEARTBEAT).touch()
+
+    def usage(self) -> Dict[str, int]:
+        """Get the size in bytes and the number of files of the session folder."""
+        size, files = _folder_usage(self.folder)
+        return {'size': size, 'files': files}
+
+    def enforce_quota(self, quota: int = SESSION_QUOTA) -> int:
+        """Remove the least recently used files that can be downloaded again until
+        the session fits in its quota.
+
+        Returns:
+            The number of bytes that are still over the quota. Only uploads are left
+            in that case.
+        """
+        excess = self.usage()['size'] - quota
+        if excess <= 0:
+            return 0
+        files = []
+        for pattern in SESSION_REGENERABLE:
+            files.extend(list_files(self.folder, pattern))
+        return max(excess - remove_least_recent(files, excess), 0)
+
+
+def usage() -> Dict[str, Dict[str, int]]:
+    """Get the size in bytes and the number of files of every part of the workspace."""
+    report = {}
+    if not CACHE_FOLDER.exists():
+        return report
+    for folder in sorted(CACHE_FOLDER.iterdir()):
+        if folder.is_dir():
+            size, files = _folder_usage(folder)
+            report[folder.name] = {'size': size, 'files': files}
+    return report
+
+
+def remove_expired(ttl: int = SESSION_TTL) -> List[str]:
+    """Remove the folders of the sessions that are not used for ttl seconds.
+
+    The design options of a base model are removed too if none of their files are
+    used for ttl seconds and none of them are pinned, and so are the temporary
+    folders of the VTKJS conversions that did not finish.
+
+    Returns:
+        The ids of the removed sessions.
+    """
+    expiry = time.time() - ttl
+    removed = []
+    for folder in cache_folder('sessions').iterdir():
+        heartbeat = folder.joinpath(HEARTBEAT)
+        try:
+            last_used = heartbeat.stat().st_mtime
+        except FileNotFoundError:
+            last_used = folder.stat().st_mtime
+        if last_used < expiry:
+            shutil.rmtree(folder.as_posix(), ignore_errors=True)
+            removed.append(folder.name)
+
+    for folder in cache_folder('design_options').iterdir():
+        files = list_files(folder)
+        if has_pinned(folder):
+            continue
+        if not files or max(mtime for mtime, _, _ in files) < expiry:
+            shutil.rmtree(folder.as_posix(), ignore_errors=True)
+
+    for folder in cache_folder('vtkjs').iterdir():
+        if folder.is_dir() and folder.stat().st_mtime < expiry:
+            shutil.rmtree(folder.as_posix(), ignore_errors=True)
+
+    return removed
+
+
+def enforce_quota(quota: int = WORKSPACE_QUOTA) -> int:
+    """Remove the least recently used files that can be created again from all the
+    sessions and the shared cache until the workspace fits in its quota.
+
+    Pinned files, like design options that are being uploaded, are not removed.
+
+    Returns:
+        The number of bytes that are still over the quota.
+    """
+    excess = _folder_usage(CACHE_FOLDER)[0] - quota
+    if excess <= 0:
+        return 0
+    files = []
+    for name, pattern in REGENERABLE:
+        pattern = f'*/{pattern}' if name == 'sessions' else pattern
+        files.extend(list_files(cache_folder(name), pattern))
+    return max(excess - remove_least_recent(files, excess), 0)
+
+
+def cleanup(force: bool = False) -> None:
+    """Remove the expired sessions and enforce the workspace quota.
+
+    It runs at most once every CLEANUP_INTERVAL seconds unless force is True.
+    """
+    global _last_cleanup
+    with _lock:
+        if not force and time.time() - _last_cleanup < CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.time()
+        remove_expired()
+        enforce_quota()
+
+
+def cleanup_in_background() -> None:
+    """Clean up the workspace on a background thread if it is due."""
+    if time.time() - _last_cleanup >= CLEANUP_INTERVAL:
+        threading.Thread(target=cleanup, daemon=True).start()